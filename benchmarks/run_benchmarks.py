@@ -0,0 +1,246 @@
+"""
+End-to-end benchmarks for jellyfin-rating-cover-burner on a synthetic library.
+
+    python benchmarks/run_benchmarks.py --movies 300 --shows 30 --output results.json
+    python benchmarks/run_benchmarks.py --compare old.json --output new.json
+
+Every scenario runs in a fresh interpreter on its own copy of the library, with its own
+cache directory, so peak RSS and cache state are per scenario:
+
+  burn-staged      sequential burn, timed per stage (walk, nfo, backups, change_check, decode, ...)
+  burn-rerun       the same library again (covers already current)
+  burn-processes   run_burn() with a process pool
+  burn-pipeline    run_burn() with the threaded pipeline
+  restore          restore after a burn, timed per stage (walk, lookup, copy)
+
+Stage names are the script's own (stage() / timed_stages()). The two run_burn() scenarios
+report the per-folder stage times the workers send back (RunStats), summed over all workers,
+so they can add up to more than the wall time. Peak RSS is given for the scenario process
+and, separately, for the largest of its worker processes.
+"""
+
+import argparse
+import contextlib
+import datetime
+import hashlib
+import io
+import json
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from synthetic_library import SCRIPT, COVER_SIZES, default_cfg, generate, load_burner, parse_sizes
+
+SCENARIOS = ["burn-staged", "burn-rerun", "burn-processes", "burn-pipeline", "restore"]
+
+
+# ============================================================
+# Child side (one scenario per interpreter)
+# ============================================================
+
+def peak_rss_kib() -> Dict[str, Optional[int]]:
+    try:
+        import resource
+    except ImportError:  # Windows
+        return {"self": None, "children": None}
+    scale = 1024 if sys.platform == "darwin" else 1  # ru_maxrss is bytes on macOS, KiB elsewhere
+    return {
+        "self": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss // scale,
+        "children": resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss // scale,
+    }
+
+
+def _timed(stages: Dict[str, float], name: str, fn, *args):
+    t = time.perf_counter()
+    try:
+        return fn(*args)
+    finally:
+        stages[name] = stages.get(name, 0.0) + time.perf_counter() - t
+
+
+def staged_burn(m, root: Path, cfg: Dict) -> Dict:
+    stages: Dict[str, float] = {}
+    counts: Dict[str, int] = {}
+    records = _timed(stages, "walk", lambda: list(m.iter_dir_records(root, True)))
+    _timed(stages, "setup", m._init_burn_worker, cfg)
+    with m.captured_output(), m.timed_stages(stages):
+        for rec in records:
+            if rec.cover is None:
+                status = "no_cover"
+            else:
+                try:
+                    status = m.process_dir(rec, cfg, "rating")
+                except Exception:
+                    status = "error"
+            counts[status] = counts.get(status, 0) + 1
+    return {"folders": len(records), "stages": stages, "counts": counts}
+
+
+def engine_burn(m, root: Path, cfg: Dict, engine: str, workers: int) -> Dict:
+    stats = m.RunStats()
+    with contextlib.redirect_stdout(io.StringIO()):
+        counts = m.run_burn(m.iter_dir_records(root, True), cfg, "rating", workers=workers, engine=engine,
+                            stats=stats)
+    stages = {k: v for k, v in stats.totals.items() if k != "total"}
+    return {"folders": counts["checked"], "stages": stages, "counts": counts}
+
+
+def staged_restore(m, root: Path) -> Dict:
+    stages: Dict[str, float] = {}
+    counts: Dict[str, int] = {}
+    records = _timed(stages, "walk", lambda: list(m.iter_dir_records(root, True)))
+    with m.captured_output(), m.timed_stages(stages):
+        for rec in records:
+            try:
+                status = "restored" if m.restore_cover(rec) else "no_backup"
+            except Exception:
+                status = "error"
+            counts[status] = counts.get(status, 0) + 1
+    return {"folders": len(records), "stages": stages, "counts": counts}
+
+
+def run_child(scenario: str, root: Path, workers: int) -> Dict:
+    m = load_burner()
+    cfg = default_cfg(m)
+    t = time.perf_counter()
+    if scenario in ("burn-staged", "burn-rerun"):
+        res = staged_burn(m, root, cfg)
+    elif scenario == "burn-processes":
+        res = engine_burn(m, root, cfg, "processes", workers)
+    elif scenario == "burn-pipeline":
+        res = engine_burn(m, root, cfg, "pipeline", workers)
+    elif scenario == "restore":
+        res = staged_restore(m, root)
+    else:
+        raise SystemExit(f"unknown scenario: {scenario}")
+    seconds = time.perf_counter() - t
+    res["seconds"] = seconds
+    res["folders_per_sec"] = res["folders"] / seconds if seconds else None
+    res["peak_rss_kib"] = peak_rss_kib()
+    return res
+
+
+# ============================================================
+# Parent side
+# ============================================================
+
+def spawn(scenario: str, root: Path, cache: Path, workers: int) -> Dict:
+    env = dict(os.environ, XDG_CACHE_HOME=str(cache), LOCALAPPDATA=str(cache))
+    out = subprocess.run(
+        [sys.executable, str(Path(__file__).resolve()), "--child", scenario, "--library", str(root),
+         "--workers", str(workers)],
+        env=env, check=True, stdout=subprocess.PIPE, text=True,
+    ).stdout
+    return json.loads(out.strip().splitlines()[-1])
+
+
+def run_all(work: Path, scenarios: List[str], workers: int) -> Dict[str, Dict]:
+    pristine = work / "library"
+    results: Dict[str, Dict] = {}
+
+    def fresh(name: str) -> Path:
+        dst = work / name
+        shutil.rmtree(dst, ignore_errors=True)
+        shutil.copytree(pristine, dst)
+        return dst
+
+    staged = None
+    for scenario in scenarios:
+        if scenario == "burn-rerun":
+            if staged is None:
+                staged = fresh("staged")
+                spawn("burn-staged", staged, work / "cache-staged", workers)
+            root, cache = staged, work / "cache-staged"
+        elif scenario == "restore":
+            root, cache = fresh("restore"), work / "cache-restore"
+            spawn("burn-processes", root, cache, workers)
+        else:
+            name = "staged" if scenario == "burn-staged" else scenario
+            root, cache = fresh(name), work / f"cache-{name}"
+            if scenario == "burn-staged":
+                staged = root
+        print(f"  {scenario} ...", file=sys.stderr, flush=True)
+        results[scenario] = spawn(scenario, root, cache, workers)
+    return results
+
+
+def print_table(results: Dict[str, Dict], previous: Optional[Dict[str, Dict]] = None):
+    for name, res in results.items():
+        stages = ", ".join(f"{k} {v:.2f}s" for k, v in res["stages"].items())
+        rss, children = res["peak_rss_kib"]["self"], res["peak_rss_kib"]["children"]
+        line = f"{name:15} {res['folders_per_sec'] or 0:8.1f} folders/s  {res['seconds']:7.2f}s"
+        if rss is not None:
+            line += f"  peak {rss / 1024:.0f} MiB"
+        if children:
+            line += f" (workers {children / 1024:.0f} MiB)"
+        if previous and name in previous and previous[name].get("folders_per_sec"):
+            line += f"  ({res['folders_per_sec'] / previous[name]['folders_per_sec']:.2f}x vs previous)"
+        print(line)
+        if stages:
+            print(f"{'':15} {stages}")
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--movies", type=int, default=200)
+    ap.add_argument("--shows", type=int, default=20)
+    ap.add_argument("--seasons", type=int, default=3)
+    ap.add_argument("--sizes", type=parse_sizes, default=COVER_SIZES)
+    ap.add_argument("--preburned", type=float, default=0.3)
+    ap.add_argument("--changed", type=float, default=0.1)
+    ap.add_argument("--large-nfo", type=float, default=0.1)
+    ap.add_argument("--seed", type=int, default=1)
+    ap.add_argument("--workers", type=int, default=os.cpu_count() or 1,
+                    help="pool size (processes) / threads per I/O stage (pipeline)")
+    ap.add_argument("--scenarios", default=",".join(SCENARIOS))
+    ap.add_argument("--workdir", type=Path, help="keep the libraries here instead of a temp dir")
+    ap.add_argument("--output", type=Path, help="write results as JSON")
+    ap.add_argument("--compare", type=Path, help="earlier results JSON to compare against")
+    ap.add_argument("--child", help=argparse.SUPPRESS)
+    ap.add_argument("--library", type=Path, help=argparse.SUPPRESS)
+    args = ap.parse_args()
+
+    if args.child:
+        print(json.dumps(run_child(args.child, args.library, args.workers)))
+        return
+
+    scenarios = [s for s in args.scenarios.split(",") if s]
+    work = args.workdir or Path(tempfile.mkdtemp(prefix="jrcb-bench-"))
+    try:
+        print(f"Generating library in {work / 'library'} ...", file=sys.stderr, flush=True)
+        shutil.rmtree(work / "library", ignore_errors=True)
+        t = time.perf_counter()
+        library = generate(work / "library", args.movies, args.shows, args.seasons, args.sizes,
+                           args.preburned, args.changed, args.large_nfo, args.seed)
+        library["generate_seconds"] = time.perf_counter() - t
+        results = run_all(work, scenarios, args.workers)
+    finally:
+        if args.workdir is None:
+            shutil.rmtree(work, ignore_errors=True)
+
+    from PIL import __version__ as pillow_version
+    report = {
+        "created": datetime.datetime.now().isoformat(timespec="seconds"),
+        "script_sha1": hashlib.sha1(SCRIPT.read_bytes()).hexdigest(),
+        "python": sys.version.split()[0],
+        "pillow": pillow_version,
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "workers": args.workers,
+        "library": library,
+        "scenarios": results,
+    }
+    previous = json.loads(args.compare.read_text(encoding="utf-8"))["scenarios"] if args.compare else None
+    print_table(results, previous)
+    if args.output:
+        args.output.write_text(json.dumps(report, indent=2), encoding="utf-8")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,165 @@
+"""
+Startup cost of jellyfin-rating-cover-burner, as paid by every cron / watch / webhook triggered run.
+
+    python benchmarks/startup_benchmark.py --runs 10 --output startup.json
+    python benchmarks/startup_benchmark.py --compare startup.json
+
+Scenarios (each run is a fresh interpreter):
+
+  help          `--help` (argument parsing, nothing else)
+  import        importing the script as a module (what BurnEngine users pay once)
+  first-folder  `burn` of a library with a single folder, until the process exits
+
+"cold" runs start with an empty bytecode cache (PYTHONPYCACHEPREFIX) and an empty user cache
+directory, so every module is compiled again and fonts / fingerprints are not cached; "warm"
+runs reuse both. One warm `python -X importtime` import lists the slowest top-level imports.
+The script itself is compiled on every run when started as a file; that cost is reported too.
+"""
+
+import argparse
+import datetime
+import json
+import os
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from synthetic_library import SCRIPT, generate
+
+SCENARIOS = ["help", "import", "first-folder"]
+
+IMPORT_SNIPPET = (
+    f"import importlib, sys; sys.path.insert(0, {str(SCRIPT.parent)!r}); "
+    f"importlib.import_module({SCRIPT.stem!r})"
+)
+
+
+def scenario_cmd(scenario: str, library: Path) -> List[str]:
+    if scenario == "help":
+        return [sys.executable, str(SCRIPT), "--help"]
+    if scenario == "import":
+        return [sys.executable, "-c", IMPORT_SNIPPET]
+    return [sys.executable, str(SCRIPT), "burn", str(library), "--json"]
+
+
+def timed_run(cmd: List[str], env: Dict[str, str]) -> float:
+    t = time.perf_counter()
+    subprocess.run(cmd, env=env, check=True, stdout=subprocess.DEVNULL)
+    return (time.perf_counter() - t) * 1000
+
+
+def _env(pycache: Path, cache: Path) -> Dict[str, str]:
+    env = dict(os.environ, PYTHONPYCACHEPREFIX=str(pycache), XDG_CACHE_HOME=str(cache), LOCALAPPDATA=str(cache))
+    env.pop("PYTHONDONTWRITEBYTECODE", None)  # warm runs need the bytecode written by the first one
+    return env
+
+
+def _summary(times: List[float]) -> Dict[str, float]:
+    return {"min": min(times), "median": statistics.median(times), "max": max(times)}
+
+
+def measure(scenario: str, work: Path, pristine: Path, runs: int) -> Dict:
+    library = work / "library"
+
+    def fresh_library():
+        shutil.rmtree(library, ignore_errors=True)
+        shutil.copytree(pristine, library)
+
+    cold = []
+    for i in range(runs):
+        fresh_library()
+        env = _env(work / f"pycache-cold-{i}", work / f"cache-cold-{i}")
+        cold.append(timed_run(scenario_cmd(scenario, library), env))
+
+    env = _env(work / "pycache-warm", work / "cache-warm")
+    fresh_library()
+    timed_run(scenario_cmd(scenario, library), env)  # fills both caches
+    warm = []
+    for _ in range(runs):
+        fresh_library()  # the folder is burned again each time, not found current
+        warm.append(timed_run(scenario_cmd(scenario, library), env))
+    return {"cold_ms": _summary(cold), "warm_ms": _summary(warm)}
+
+
+def import_profile(work: Path, top: int = 15) -> Dict:
+    """Slowest top-level imports of one warm import (-X importtime, cumulative microseconds)"""
+    env = _env(work / "pycache-warm", work / "cache-warm")
+    err = subprocess.run([sys.executable, "-X", "importtime", "-c", IMPORT_SNIPPET], env=env, check=True,
+                         stderr=subprocess.PIPE, text=True).stderr
+    rows = []
+    for line in err.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, self_us, cum_us, name = (part.strip() for part in line.replace("import time:", "|", 1).split("|"))
+        if not line.rsplit("|", 1)[1].startswith("  "):  # nested imports are indented
+            rows.append({"module": name, "self_us": int(self_us), "cumulative_us": int(cum_us)})
+    rows.sort(key=lambda r: r["cumulative_us"], reverse=True)
+    return {"total_us": sum(r["cumulative_us"] for r in rows), "slowest": rows[:top]}
+
+
+def script_compile_ms(repeat: int = 5) -> float:
+    source = SCRIPT.read_text(encoding="utf-8")
+    best = float("inf")
+    for _ in range(repeat):
+        t = time.perf_counter()
+        compile(source, str(SCRIPT), "exec")
+        best = min(best, time.perf_counter() - t)
+    return best * 1000
+
+
+def print_table(results: Dict[str, Dict], previous: Optional[Dict[str, Dict]] = None):
+    for name, res in results.items():
+        cold, warm = res["cold_ms"]["median"], res["warm_ms"]["median"]
+        line = f"{name:13} cold {cold:7.1f} ms  warm {warm:7.1f} ms"
+        if previous and name in previous:
+            line += f"  ({previous[name]['warm_ms']['median'] / warm:.2f}x warm vs previous)"
+        print(line)
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--runs", type=int, default=5, help="runs per scenario and cache state (median reported)")
+    ap.add_argument("--scenarios", default=",".join(SCENARIOS))
+    ap.add_argument("--output", type=Path, help="write results as JSON")
+    ap.add_argument("--compare", type=Path, help="earlier results JSON to compare against")
+    args = ap.parse_args()
+
+    scenarios = [s for s in args.scenarios.split(",") if s]
+    work = Path(tempfile.mkdtemp(prefix="jrcb-startup-"))
+    try:
+        pristine = work / "pristine"
+        generate(pristine, movies=1, shows=0, seasons=0, sizes=[(1000, 1500)], preburned=0, changed=0,
+                 large_nfo=0, seed=1)
+        results = {}
+        for scenario in scenarios:
+            print(f"  {scenario} ...", file=sys.stderr, flush=True)
+            results[scenario] = measure(scenario, work, pristine, args.runs)
+        imports = import_profile(work)
+    finally:
+        shutil.rmtree(work, ignore_errors=True)
+
+    report = {
+        "created": datetime.datetime.now().isoformat(timespec="seconds"),
+        "python": sys.version.split()[0],
+        "runs": args.runs,
+        "script_compile_ms": script_compile_ms(),
+        "scenarios": results,
+        "imports": imports,
+    }
+    previous = json.loads(args.compare.read_text(encoding="utf-8"))["scenarios"] if args.compare else None
+    print_table(results, previous)
+    print(f"{'':13} script compile {report['script_compile_ms']:.1f} ms, "
+          f"top-level imports {imports['total_us'] / 1000:.1f} ms")
+    for row in imports["slowest"][:5]:
+        print(f"{'':13} {row['module']:28} {row['cumulative_us'] / 1000:6.1f} ms")
+    if args.output:
+        args.output.write_text(json.dumps(report, indent=2), encoding="utf-8")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,213 @@
+"""
+Synthetic Jellyfin-style library for benchmarking jellyfin-rating-cover-burner.
+
+    python benchmarks/synthetic_library.py OUT_DIR --movies 200 --shows 20 --seasons 3
+
+Movies get movie.nfo / <title>.nfo files in several variants (<rating>, comma decimals,
+<ratings> blocks, critic rating only, no rating, large cast lists), shows get tvshow.nfo
+and season folders. Covers come in several resolutions; a share of the folders is burned
+with the script's defaults and some of those get a new poster afterwards (as if Jellyfin
+had refreshed it), so change detection is exercised too.
+"""
+
+import argparse
+import importlib
+import json
+import random
+import sys
+from pathlib import Path
+from typing import Dict, List, Tuple
+
+from PIL import Image, ImageDraw
+
+SCRIPT = Path(__file__).resolve().parent.parent / "jellyfin-rating-cover-burner.py"
+
+COVER_SIZES = [(600, 900), (1000, 1500), (2000, 3000)]
+NFO_VARIANTS = ["rating", "comma", "ratings_block", "title_named", "critic_only", "no_rating"]
+
+
+def load_burner():
+    """Import the script as a module, by its file name so spawned worker processes can import it too"""
+    if str(SCRIPT.parent) not in sys.path:
+        sys.path.insert(0, str(SCRIPT.parent))
+    return importlib.import_module(SCRIPT.stem)
+
+
+def default_cfg(m) -> Dict:
+    """Badge config with the defaults build_cfg_from_user() offers"""
+    color = (*m.parse_hex_to_rgb(m.DEFAULT_HEX), 255)
+    return {**m.DEFAULTS, "star_color": color, "text_color": color, "round_left": True, "round_right": True}
+
+
+def parse_sizes(text: str) -> List[Tuple[int, int]]:
+    return [tuple(int(v) for v in part.lower().split("x")) for part in text.split(",") if part]
+
+
+def write_cover(p: Path, size: Tuple[int, int], seed: int):
+    rng = random.Random(seed)
+    img = Image.new("RGB", size, tuple(rng.randrange(256) for _ in range(3)))
+    draw = ImageDraw.Draw(img)
+    w, h = size
+    for _ in range(24):
+        x, y = rng.randrange(w), rng.randrange(h)
+        r = rng.randrange(w // 20, w // 4)
+        draw.ellipse([x - r, y - r, x + r, y + r], fill=tuple(rng.randrange(256) for _ in range(3)))
+    for _ in range(6):
+        y = rng.randrange(h)
+        draw.rectangle([0, y, w, y + rng.randrange(4, h // 30)], fill=tuple(rng.randrange(256) for _ in range(3)))
+    img.save(p, format="JPEG", quality=90)
+
+
+def _cast(rng: random.Random, n: int) -> str:
+    return "".join(
+        f"  <actor>\n    <name>Actor {i}</name>\n    <role>Role {rng.randrange(1000)}</role>\n"
+        f"    <type>Actor</type>\n    <thumb>https://image.example/{rng.getrandbits(64):x}.jpg</thumb>\n  </actor>\n"
+        for i in range(n)
+    )
+
+
+def _ratings_block(rating: float) -> str:
+    return (
+        "  <ratings>\n"
+        f'    <rating name="tmdb" max="10"><value>{max(0.0, rating - 0.4):.1f}</value><votes>812</votes></rating>\n'
+        f'    <rating name="imdb" max="10" default="true"><value>{rating:.1f}</value><votes>120345</votes></rating>\n'
+        "  </ratings>\n"
+    )
+
+
+def movie_nfo(rng: random.Random, title: str, rating: float, variant: str, large: bool) -> str:
+    head = f"  <title>{title}</title>\n  <plot>{'Lorem ipsum dolor sit amet. ' * (200 if large else 3)}</plot>\n"
+    if variant in ("rating", "title_named"):
+        fields = f"  <rating>{rating:.1f}</rating>\n  <criticrating>{int(rating * 10)}</criticrating>\n"
+    elif variant == "comma":
+        fields = f"  <rating>{rating:.1f}</rating>\n".replace(".", ",")
+    elif variant == "ratings_block":
+        fields = _ratings_block(rating)
+    elif variant == "critic_only":
+        fields = f"  <criticrating>{int(rating * 10)}</criticrating>\n"
+    else:
+        fields = ""
+    # Large files keep the rating behind the cast list, the slowest case for a streaming reader
+    cast = _cast(rng, 400 if large else 5)
+    body = head + cast + fields if large else head + fields + cast
+    return (
+        '<?xml version="1.0" encoding="utf-8" standalone="yes"?>\n<movie>\n'
+        + body
+        + f'  <uniqueid type="imdb" default="true">tt{rng.randrange(10 ** 7):07d}</uniqueid>\n</movie>\n'
+    )
+
+
+def show_nfo(rng: random.Random, title: str, rating: float, large: bool) -> str:
+    return (
+        '<?xml version="1.0" encoding="utf-8" standalone="yes"?>\n<tvshow>\n'
+        f"  <title>{title}</title>\n"
+        + _ratings_block(rating)
+        + _cast(rng, 400 if large else 5)
+        + "</tvshow>\n"
+    )
+
+
+def generate(root: Path, movies: int = 100, shows: int = 10, seasons: int = 3,
+             sizes: List[Tuple[int, int]] = None, preburned: float = 0.3, changed: float = 0.1,
+             large_nfo: float = 0.1, seed: int = 1) -> Dict:
+    """Build the library under root and return a summary of what was generated"""
+    sizes = sizes or COVER_SIZES
+    rng = random.Random(seed)
+    folders: List[Path] = []
+    nfo_counts = {v: 0 for v in NFO_VARIANTS}
+    large_count = 0
+
+    for i in range(movies):
+        title = f"Movie {i:05d}"
+        d = root / "Movies" / f"{title} ({1950 + i % 75})"
+        d.mkdir(parents=True, exist_ok=True)
+        variant = NFO_VARIANTS[i % len(NFO_VARIANTS)]
+        large = rng.random() < large_nfo
+        nfo_name = f"{title}.nfo" if variant == "title_named" else "movie.nfo"
+        text = movie_nfo(rng, title, rng.uniform(1.0, 9.9), variant, large)
+        (d / nfo_name).write_text(text, encoding="utf-8")
+        write_cover(d / "folder.jpg", sizes[i % len(sizes)], seed * 100003 + i)
+        nfo_counts[variant] += 1
+        large_count += large
+        folders.append(d)
+
+    for i in range(shows):
+        title = f"Show {i:04d}"
+        s = root / "Shows" / title
+        s.mkdir(parents=True, exist_ok=True)
+        large = rng.random() < large_nfo
+        (s / "tvshow.nfo").write_text(show_nfo(rng, title, rng.uniform(1.0, 9.9), large), encoding="utf-8")
+        write_cover(s / "folder.jpg", sizes[i % len(sizes)], seed * 200003 + i)
+        large_count += large
+        folders.append(s)
+        for n in range(1, seasons + 1):
+            season = s / f"Season {n:02d}"
+            season.mkdir(exist_ok=True)
+            (season / "season.nfo").write_text(
+                f'<?xml version="1.0" encoding="utf-8"?>\n<season>\n  <seasonnumber>{n}</seasonnumber>\n</season>\n',
+                encoding="utf-8",
+            )
+            write_cover(season / "folder.jpg", sizes[(i + n) % len(sizes)], seed * 300007 + i * 100 + n)
+            folders.append(season)
+
+    burned, refreshed = _burn_some(folders, rng, preburned, changed, sizes, seed)
+    return {
+        "movies": movies,
+        "shows": shows,
+        "seasons_per_show": seasons,
+        "folders": len(folders),
+        "cover_sizes": [f"{w}x{h}" for w, h in sizes],
+        "nfo_variants": nfo_counts,
+        "large_nfos": large_count,
+        "preburned": burned,
+        "changed_posters": refreshed,
+        "seed": seed,
+    }
+
+
+def _burn_some(folders: List[Path], rng: random.Random, preburned: float, changed: float,
+               sizes: List[Tuple[int, int]], seed: int) -> Tuple[int, int]:
+    picked = [d for d in folders if rng.random() < preburned]
+    if not picked:
+        return 0, 0
+    m = load_burner()
+    use_cache, m.FINGERPRINT_CACHE = m.FINGERPRINT_CACHE, False  # keep the user's cache out of it
+    cfg = default_cfg(m)
+    burned = 0
+    try:
+        with m.captured_output():
+            for d in picked:
+                if m.process_dir(m.scan_dir(d), cfg, "rating") == "processed":
+                    burned += 1
+    finally:
+        m.FINGERPRINT_CACHE = use_cache
+
+    # A refreshed poster: clean, and different enough from the backup to trigger a new one
+    refreshed = 0
+    for i, d in enumerate(picked):
+        if rng.random() < changed / max(preburned, 1e-9):
+            write_cover(d / "folder.jpg", sizes[i % len(sizes)], seed * 400009 + i)
+            refreshed += 1
+    return burned, refreshed
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("root", type=Path, help="output directory (created)")
+    ap.add_argument("--movies", type=int, default=100)
+    ap.add_argument("--shows", type=int, default=10)
+    ap.add_argument("--seasons", type=int, default=3, help="season folders per show")
+    ap.add_argument("--sizes", type=parse_sizes, default=COVER_SIZES, help="cover sizes, e.g. 600x900,2000x3000")
+    ap.add_argument("--preburned", type=float, default=0.3, help="share of folders burned up front")
+    ap.add_argument("--changed", type=float, default=0.1, help="share of folders with a new poster after burning")
+    ap.add_argument("--large-nfo", type=float, default=0.1, help="share of NFOs with a large cast list")
+    ap.add_argument("--seed", type=int, default=1)
+    args = ap.parse_args()
+
+    summary = generate(args.root, args.movies, args.shows, args.seasons, args.sizes,
+                       args.preburned, args.changed, args.large_nfo, args.seed)
+    print(json.dumps(summary, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -1,14 +1,33 @@
 #!/usr/bin/env python3
 # -*- coding: utf-8 -*-
 
+from __future__ import annotations  # annotations like Image.Image must not import Pillow at startup
+
+import io
+import os
 import sys
 import re
+import json
+import errno
 import math
+import mmap
+import time
+import heapq
+import queue
+import select
+import bisect
 import shutil
-import subprocess
+import struct
+import hashlib
+import posixpath
+import threading
 import warnings
+import importlib
+import abc
+from contextlib import contextmanager, nullcontext
+from dataclasses import dataclass, field, asdict
 from pathlib import Path
-from typing import Optional, Tuple, List, Dict
+from typing import Optional, Tuple, List, Dict, Iterable, NamedTuple, Union, BinaryIO, Callable
 
 # Hide DeprecationWarning (e.g. from libraries) – we'll fix the source eventually
 warnings.filterwarnings("ignore", category=DeprecationWarning)
@@ -19,8 +38,9 @@ warnings.filterwarnings("ignore", category=DeprecationWarning)
 
 REQUIRED = [
     ("PIL", "pillow"),
-    ("colorama", "colorama"),
 ]
+if sys.platform == "win32":
+    REQUIRED.append(("colorama", "colorama"))  # ANSI colors in the Windows console
 
 DEPS_HINTS = {
     "pillow": "Pillow (PIL module) – image processing / cover generation",
@@ -29,17 +49,19 @@ DEPS_HINTS = {
 
 
 def _pip_install(pkgs: List[str]):
+    import subprocess
     subprocess.check_call([sys.executable, "-m", "pip", "install", "--upgrade", *pkgs])
 
 
-def ensure_deps():
-    missing = []
-    for import_name, pip_name in REQUIRED:
-        try:
-            __import__(import_name)
-        except Exception:
-            missing.append((import_name, pip_name))
+def missing_deps() -> List[Tuple[str, str]]:
+    """Required packages that are not installed (looked up without importing them)"""
+    import importlib.util
+    return [(import_name, pip_name) for import_name, pip_name in REQUIRED
+            if importlib.util.find_spec(import_name) is None]
+
 
+def ensure_deps(assume_yes: bool = False):
+    missing = missing_deps()
     if not missing:
         return
 
@@ -55,7 +77,9 @@ def ensure_deps():
         else:
             print(f"  • {hint}")
 
-    if len(pip_pkgs) == 1:
+    if assume_yes:
+        ans = "y"
+    elif len(pip_pkgs) == 1:
         ans = input(f"Install it now using '{cmd}'? [Y/n]: ").strip().lower()
     else:
         ans = input(f"Install them now using '{cmd}'? [Y/n]: ").strip().lower()
@@ -73,13 +97,48 @@ def ensure_deps():
         sys.exit(1)
 
 
-ensure_deps()
+def enable_console_colors():
+    """The Windows console needs colorama for the ANSI colors used below; elsewhere they just work"""
+    if sys.platform != "win32":
+        return
+    try:
+        from colorama import just_fix_windows_console
+    except ImportError:
+        return
+    just_fix_windows_console()
+
 
-from colorama import Style
-from colorama import just_fix_windows_console
-from PIL import Image, ImageDraw, ImageFont, ImageOps
+# ============================================================
+# Lazy imports
+# ============================================================
 
-just_fix_windows_console()
+class _LazyModule:
+    """Stands in for a module until its first attribute access, then imports it and takes its global name"""
+
+    def __init__(self, name: str, alias: str):
+        self._name = name
+        self._alias = alias
+
+    def __getattr__(self, attr: str):
+        module = importlib.import_module(self._name)
+        globals()[self._alias] = module
+        return getattr(module, attr)
+
+
+# Pillow and the heavier standard modules load when first used, so starting (--help, a watcher
+# waiting for its first change, a one-folder run) only pays for what it needs
+Image = _LazyModule("PIL.Image", "Image")
+ImageChops = _LazyModule("PIL.ImageChops", "ImageChops")
+ImageDraw = _LazyModule("PIL.ImageDraw", "ImageDraw")
+ImageFont = _LazyModule("PIL.ImageFont", "ImageFont")
+ImageOps = _LazyModule("PIL.ImageOps", "ImageOps")
+ET = _LazyModule("xml.etree.ElementTree", "ET")
+futures = _LazyModule("concurrent.futures", "futures")
+sqlite3 = _LazyModule("sqlite3", "sqlite3")
+datetime = _LazyModule("datetime", "datetime")
+tempfile = _LazyModule("tempfile", "tempfile")
+gzip = _LazyModule("gzip", "gzip")
+ctypes = _LazyModule("ctypes", "ctypes")
 
 # ============================================================
 # Constants / defaults
@@ -87,6 +146,8 @@ just_fix_windows_console()
 
 TARGET_SIZE = (300, 450)
 TARGET_DPI = (96, 96)
+JPEG_QUALITY = 95
+JPEG_SUBSAMPLING = 0  # 4:4:4, keeps the badge text sharp
 COVER_NAME = "folder.jpg"
 
 EXIF_MARKER = "JF_RATING_BADGE_V6"
@@ -108,9 +169,59 @@ DEFAULTS = {
 
 BACKUP_PREFIX = "folder_backup"
 
+# Optional content-addressed backup store. None keeps plain folder_backup*.jpg copies next to each cover,
+# "dir" keeps a store in every folder, "library" one store at the library root (identical covers stored once).
+# Folders list their stored backups in BACKUP_MANIFEST. Files are cloned with reflinks where supported.
+BACKUP_STORE: Optional[str] = None
+BACKUP_STORE_DIR = ".rating-backups"
+BACKUP_MANIFEST = ".folder_backup.json"
+# Fall back to hard links when reflinks are not supported. Only safe if nothing rewrites folder.jpg in place.
+BACKUP_HARDLINKS = False
+
+SHOW_NFO = "tvshow.nfo"
+SEASON_NFO = "season.nfo"
+MOVIE_NFO = "movie.nfo"
+# Season folders: also try episode NFOs when neither season.nfo nor the show's tvshow.nfo has a rating
+READ_EPISODE_NFOS = False
+
 AHASH_THRESHOLD_BITS = 80
 HIST_THRESHOLD = 0.25
 
+# Decode JPEGs at 1/2, 1/4 or 1/8 scale when that still covers what the consumer needs.
+# The cover keeps DRAFT_OVERSAMPLE x the target size so the final LANCZOS resize does the filtering.
+DRAFT_DECODE = True
+DRAFT_OVERSAMPLE = 2
+DRAFT_MAX_MEAN_DIFF = 1.0  # per-channel mean abs difference (0-255) accepted by the decode check
+
+APP_NAME = "jellyfin-rating-cover-burner"
+STATE_DB_NAME = "state.sqlite"
+FINGERPRINT_DB_NAME = "fingerprints.sqlite"
+FINGERPRINT_CACHE = True  # remember backup fingerprints between runs (backups never change once written)
+
+# Optional stage timing report: latency histogram buckets and how many of the slowest folders to list
+TIMING_BUCKETS_MS = (1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000, 5000)
+SLOWEST_DIRS = 10
+
+# Progress mode: redraw interval of the progress line; per-folder messages go to a JSON lines log instead
+PROGRESS_INTERVAL = 0.2
+LOG_DIR_NAME = "logs"
+
+# Threaded pipeline: threads for each I/O stage (NFO, read, write); drawing gets one per CPU
+PIPELINE_IO_THREADS = 4
+PIPELINE_QUEUE_DEPTH = 2  # folders buffered between stages, per thread
+
+# Watch mode: seconds of quiet before a changed folder is re-burned (Jellyfin writes several files per item),
+# and the listing interval when inotify is not available
+WATCH_DEBOUNCE = 3.0
+WATCH_POLL_INTERVAL = 30.0
+
+# Webhook listener (Jellyfin Webhook plugin). Use "0.0.0.0" to accept calls from another machine,
+# ideally with a token (sent as ?token=... or an X-Webhook-Token header).
+WEBHOOK_HOST = "127.0.0.1"
+WEBHOOK_PORT = 8097
+WEBHOOK_TOKEN: Optional[str] = None
+WEBHOOK_MAX_BODY = 1024 * 1024
+
 # ============================================================
 # Console helpers + truecolor (HEX) using ANSI
 # ============================================================
@@ -140,26 +251,301 @@ def color_hex_text(text: str, hex_color: str) -> str:
         return text
 
 
+# Worker output is collected per directory and printed by the main process,
+# so lines from parallel folders never interleave.
+_OUTPUT = threading.local()
+
+
+@contextmanager
+def captured_output(lines: Optional[List[str]] = None):
+    prev = getattr(_OUTPUT, "lines", None)
+    if lines is None:
+        lines = []
+    _OUTPUT.lines = lines
+    try:
+        yield lines
+    finally:
+        _OUTPUT.lines = prev
+
+
+def _emit(text: str):
+    lines = getattr(_OUTPUT, "lines", None)
+    if lines is not None:
+        lines.append(text)
+    else:
+        print(text)
+
+
 def info(msg: str):
-    print(color_hex_text(msg, "#00D7FF"))
+    _emit(color_hex_text(msg, "#00D7FF"))
 
 
 def ok(msg: str):
-    print(color_hex_text(msg, "#33DD66"))
+    _emit(color_hex_text(msg, "#33DD66"))
 
 
 def warn(msg: str):
-    print(color_hex_text(msg, "#FFD166"))
+    _emit(color_hex_text(msg, "#FFD166"))
 
 
 def err(msg: str):
-    print(color_hex_text(msg, "#FF5C5C"))
+    _emit(color_hex_text(msg, "#FF5C5C"))
 
 
 def question(msg: str):
     print(color_hex_text(msg, "#FF8C00"))
 
 
+# ============================================================
+# Stage timing + run report (optional instrumentation)
+# ============================================================
+
+_TIMINGS = threading.local()
+
+
+@contextmanager
+def timed_stages(timings: Optional[Dict[str, float]] = None, enabled: bool = True):
+    """Collect stage() durations of this thread into `timings` (stage() is a no-op outside)"""
+    if not enabled:
+        yield timings
+        return
+    prev = getattr(_TIMINGS, "stages", None)
+    if timings is None:
+        timings = {}
+    _TIMINGS.stages = timings
+    try:
+        yield timings
+    finally:
+        _TIMINGS.stages = prev
+
+
+@contextmanager
+def stage(name: str):
+    timings = getattr(_TIMINGS, "stages", None)
+    if timings is None:
+        yield
+        return
+    t = time.perf_counter()
+    try:
+        yield
+    finally:
+        timings[name] = timings.get(name, 0.0) + time.perf_counter() - t
+
+
+def _bucket_label(i: int) -> str:
+    def fmt(ms: int) -> str:
+        return f"{ms // 1000}s" if ms >= 1000 else f"{ms}ms"
+    if i < len(TIMING_BUCKETS_MS):
+        return "<=" + fmt(TIMING_BUCKETS_MS[i])
+    return ">" + fmt(TIMING_BUCKETS_MS[-1])
+
+
+class RunStats:
+    """Per-stage totals, latency histograms and the slowest folders of one run"""
+
+    def __init__(self, slowest: int = SLOWEST_DIRS):
+        self.slowest_n = slowest
+        self.dirs = 0
+        self.totals: Dict[str, float] = {}
+        self.calls: Dict[str, int] = {}
+        self.hist: Dict[str, List[int]] = {}
+        self._slowest: List[Tuple[float, int, str, Dict[str, float]]] = []  # min-heap on total
+        self.started = time.perf_counter()
+        self.wall = 0.0
+
+    def add(self, path: Path, timings: Dict[str, float]):
+        if not timings:
+            return
+        timings = dict(timings)
+        # Folders timed without a wall clock (pipeline) count the sum of their stages
+        timings.setdefault("total", sum(timings.values()))
+        self.dirs += 1
+        for name, sec in timings.items():
+            self.totals[name] = self.totals.get(name, 0.0) + sec
+            self.calls[name] = self.calls.get(name, 0) + 1
+            hist = self.hist.setdefault(name, [0] * (len(TIMING_BUCKETS_MS) + 1))
+            hist[bisect.bisect_left(TIMING_BUCKETS_MS, sec * 1000)] += 1
+        entry = (timings["total"], self.dirs, str(path), timings)
+        if len(self._slowest) < self.slowest_n:
+            heapq.heappush(self._slowest, entry)
+        else:
+            heapq.heappushpop(self._slowest, entry)
+
+    def finish(self):
+        self.wall = time.perf_counter() - self.started
+
+    def slowest(self) -> List[Tuple[float, str, Dict[str, float]]]:
+        return [(total, path, t) for total, _, path, t in sorted(self._slowest, reverse=True)]
+
+    def _stage_names(self) -> List[str]:
+        return sorted((k for k in self.totals if k != "total"), key=lambda k: self.totals[k], reverse=True)
+
+    def to_dict(self) -> Dict:
+        return {
+            "dirs": self.dirs,
+            "wall_seconds": self.wall,
+            "buckets_ms": list(TIMING_BUCKETS_MS),
+            "stages": {
+                name: {
+                    "total_seconds": self.totals[name],
+                    "calls": self.calls[name],
+                    "mean_ms": self.totals[name] * 1000 / self.calls[name],
+                    "histogram": self.hist[name],
+                }
+                for name in [*self._stage_names(), "total"] if name in self.totals
+            },
+            "slowest": [{"path": path, "total_seconds": total, "stages": t} for total, path, t in self.slowest()],
+        }
+
+    def summary_lines(self) -> List[str]:
+        lines = [f"Stage timings for {self.dirs} folders ({self.wall:.1f}s wall):"]
+        stage_sum = sum(self.totals[k] for k in self._stage_names()) or 1e-9
+        for name in self._stage_names():
+            total, calls = self.totals[name], self.calls[name]
+            lines.append(f"  {name:<13}{total:9.2f}s {100 * total / stage_sum:5.1f}%  {calls:7}x"
+                         f"  mean {total * 1000 / calls:8.1f} ms")
+        hist = self.hist.get("total")
+        if hist:
+            lines.append("Per-folder time: " + " | ".join(f"{_bucket_label(i)} {n}" for i, n in enumerate(hist) if n))
+        slowest = self.slowest()
+        if slowest:
+            lines.append(f"Slowest {len(slowest)} folders:")
+        for total, path, t in slowest:
+            parts = sorted(((k, v) for k, v in t.items() if k != "total" and v >= 0.0005), key=lambda kv: kv[1],
+                           reverse=True)
+            lines.append(f"  {total:7.2f}s  {path}  (" + ", ".join(f"{k} {v * 1000:.0f} ms" for k, v in parts) + ")")
+        return lines
+
+    def print_summary(self):
+        lines = self.summary_lines()
+        print()
+        info(lines[0])
+        for line in lines[1:]:
+            print(line)
+
+    def export(self, path: Path):
+        path.write_text(json.dumps(self.to_dict(), indent=2), encoding="utf-8")
+
+
+@contextmanager
+def profiled(use_cprofile: bool = False, trace_memory: bool = False, export: Optional[Path] = None, top: int = 15):
+    """cProfile and/or tracemalloc around a block; prints the top entries (and saves .prof next to `export`)"""
+    prof = None
+    if use_cprofile:
+        import cProfile
+        prof = cProfile.Profile()
+    if trace_memory:
+        import tracemalloc
+        tracemalloc.start(25)
+    if prof is not None:
+        prof.enable()
+    try:
+        yield
+    finally:
+        if prof is not None:
+            prof.disable()
+            import pstats
+            buf = io.StringIO()
+            pstats.Stats(prof, stream=buf).sort_stats("cumulative").print_stats(top)
+            print()
+            info(f"cProfile, top {top} by cumulative time:")
+            print(buf.getvalue().rstrip())
+            if export is not None:
+                prof.dump_stats(str(export.with_suffix(".prof")))
+                info(f"Profile saved to {export.with_suffix('.prof')}")
+        if trace_memory:
+            snapshot = tracemalloc.take_snapshot()
+            _, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+            print()
+            info(f"tracemalloc: peak {peak / (1024 * 1024):.1f} MB traced, top {top} allocation sites:")
+            for st in snapshot.statistics("lineno")[:top]:
+                print(f"  {st}")
+
+
+# ============================================================
+# Progress line + structured run log (progress mode)
+# ============================================================
+
+_ANSI_RE = re.compile(r"\x1b\[[0-9;]*m")
+
+
+def format_duration(sec: float) -> str:
+    sec = int(round(sec))
+    return f"{sec // 3600}:{sec // 60 % 60:02d}:{sec % 60:02d}"
+
+
+class ProgressLine:
+    """One console line redrawn in place: done/total, folders/s, ETA and errors (at most every PROGRESS_INTERVAL)"""
+
+    def __init__(self, total: Optional[int] = None, interval: float = PROGRESS_INTERVAL):
+        self.total = total
+        self.interval = interval
+        self.done = 0
+        self.errors = 0
+        self.started = time.perf_counter()
+        self._last = 0.0
+        self._width = 0
+
+    def update(self, done: int, errors: int, force: bool = False):
+        self.done, self.errors = done, errors
+        now = time.perf_counter()
+        if force or now - self._last >= self.interval:
+            self._last = now
+            self._draw(self.text(now))
+
+    def text(self, now: Optional[float] = None) -> str:
+        elapsed = (now or time.perf_counter()) - self.started
+        rate = self.done / elapsed if elapsed > 0 else 0.0
+        if self.total:
+            total = max(self.total, self.done)
+            eta = format_duration((total - self.done) / rate) if rate else "?"
+            head = f"{self.done}/{total} ({100 * self.done / total:.0f}%)"
+            return f"{head} | {rate:.1f} folders/s | ETA {eta} | errors {self.errors}"
+        return f"{self.done} folders | {rate:.1f} folders/s | {format_duration(elapsed)} | errors {self.errors}"
+
+    def _draw(self, text: str):
+        sys.stdout.write("\r" + text + " " * max(0, self._width - len(text)))
+        sys.stdout.flush()
+        self._width = len(text)
+
+    def clear(self):
+        """Blank the line so regular output can be printed above it"""
+        if self._width:
+            sys.stdout.write("\r" + " " * self._width + "\r")
+            self._width = 0
+
+    def finish(self):
+        self.update(self.done, self.errors, force=True)
+        sys.stdout.write("\n")
+        sys.stdout.flush()
+
+
+class RunLog:
+    """Per-folder results as JSON lines. Buffered, so writing it costs far less than console output"""
+
+    def __init__(self, path: Path):
+        self.path = path
+        path.parent.mkdir(parents=True, exist_ok=True)
+        self.f = open(path, "a", encoding="utf-8", buffering=1 << 20)
+
+    def write(self, path: Path, status: str, lines: List[str], timings: Optional[Dict[str, float]] = None):
+        entry = {"time": round(time.time(), 3), "path": str(path), "status": status}
+        if lines:
+            entry["messages"] = [_ANSI_RE.sub("", line) for line in lines]
+        if timings:
+            entry["timings"] = {k: round(v, 6) for k, v in timings.items()}
+        self.f.write(json.dumps(entry, ensure_ascii=False) + "\n")
+
+    def close(self):
+        self.f.close()
+
+
+def default_log_path(mode: str) -> Path:
+    ts = datetime.datetime.now().strftime("%Y%m%d-%H%M%S")
+    return cache_dir() / LOG_DIR_NAME / f"{mode}-{ts}.jsonl"
+
+
 # ============================================================
 # Input parsing
 # ============================================================
@@ -216,6 +602,118 @@ def ask_hex(prompt: str, default_hex: str) -> str:
     return normalize_hex(s, default_hex)
 
 
+def default_workers() -> int:
+    return max(1, os.cpu_count() or 1)
+
+
+def ask_engine() -> str:
+    question("How should folders be processed?")
+    print("  1) Worker processes (best for covers on a local disk)")
+    print("  2) Threaded pipeline (overlaps reads/writes with drawing, best for a NAS)")
+    choice = input(color_hex_text("Choice [1/2] (default 1): ", "#FF8C00")).strip()
+    return "pipeline" if choice == "2" else "processes"
+
+
+def ask_workers(engine: str = "processes") -> int:
+    if engine == "pipeline":
+        return parse_int("Threads per I/O stage (NFO, read, write)", PIPELINE_IO_THREADS, min_v=1, max_v=64)
+    return parse_int("Worker processes (1 = one folder at a time)", default_workers(), min_v=1, max_v=64)
+
+
+def ask_use_state_index() -> bool:
+    ans = input(color_hex_text("Skip folders unchanged since the last run? [Y/n]: ", "#FF8C00")).strip().lower()
+    return ans not in ("n", "no")
+
+
+def ask_prune_policy() -> Tuple["PrunePolicy", bool]:
+    keep = parse_int("Keep newest clean backups per folder", PrunePolicy.keep_newest, min_v=1, max_v=1000)
+    ans = input(color_hex_text("Always keep the original folder_backup.jpg? [Y/n]: ", "#FF8C00")).strip().lower()
+    keep_original = ans not in ("n", "no")
+    ans = input(color_hex_text("Remove byte-identical duplicate backups? [Y/n]: ", "#FF8C00")).strip().lower()
+    drop_duplicates = ans not in ("n", "no")
+    ans = input(color_hex_text("Dry run (only report what would be removed)? [Y/n]: ", "#FF8C00")).strip().lower()
+    dry_run = ans not in ("n", "no")
+    return PrunePolicy(keep, keep_original, drop_duplicates), dry_run
+
+
+def ask_instrumentation() -> Tuple[bool, bool, bool, Optional[Path]]:
+    """(stage timings, cProfile, tracemalloc, report file)"""
+    ans = input(color_hex_text("Collect per-stage timings and list the slowest folders? [y/N]: ", "#FF8C00")).strip().lower()
+    if ans not in ("y", "yes"):
+        return False, False, False, None
+    use_cprofile = input("Also profile with cProfile? [y/N]: ").strip().lower() in ("y", "yes")
+    trace_memory = input("Also trace memory allocations (tracemalloc, slower)? [y/N]: ").strip().lower() in ("y", "yes")
+    export = input("Save the report as JSON to (Enter = don't save): ").strip().strip('"')
+    if export.lower() in ("n", "no"):  # answered like the yes/no questions above, not a file name
+        export = ""
+    return True, use_cprofile, trace_memory, Path(export) if export else None
+
+
+def ask_progress_mode() -> Tuple[bool, bool]:
+    """(single progress line + JSON lines log, count folders first for an ETA)"""
+    ans = input(color_hex_text("Show one progress line instead of per-folder messages? [y/N]: ", "#FF8C00")).strip().lower()
+    if ans not in ("y", "yes"):
+        return False, False
+    ans = input(color_hex_text("Count folders first (for an ETA)? [Y/n]: ", "#FF8C00")).strip().lower()
+    return True, ans not in ("n", "no")
+
+
+def ask_path_map() -> List[Tuple[str, str]]:
+    path_map = []
+    src = input("Library path prefix as Jellyfin sees it (Enter = same paths as here): ").strip().strip('"')
+    if src:
+        dst = input("Same folder as seen from this computer: ").strip().strip('"')
+        path_map.append((src, dst))
+    return path_map
+
+
+def ask_rating_source() -> Optional["RatingSource"]:
+    print("\n" + color_hex_text("═" * 60, "#FF8C00"))
+    question("Where should ratings come from?")
+    print("  1) NFO files next to the media")
+    print("  2) Jellyfin database (library.db / jellyfin.db), NFO files as fallback")
+    print("  3) IMDb dataset (title.ratings.tsv.gz) by the IMDb id in the NFO, NFO rating as fallback")
+    choice = input(color_hex_text("Choice [1/2/3] (default 1): ", "#FF8C00")).strip()
+    print(color_hex_text("═" * 60, "#FF8C00"))
+    if choice == "3":
+        return ask_imdb_dataset()
+    if choice != "2":
+        return None
+
+    while True:
+        raw = input("Path to library.db or jellyfin.db (Jellyfin data folder, 'data' subfolder): ").strip().strip('"')
+        db_path = Path(raw)
+        if raw and db_path.is_file():
+            break
+        err("File not found.")
+    try:
+        ratings = JellyfinRatings(db_path, ask_path_map())
+    except Exception as e:
+        err(f"Could not read {db_path.name}: {e}")
+        warn("Using NFO files only.")
+        return None
+    ok(f"Loaded ratings for {len(ratings.ratings)} folders from {db_path.name}.")
+    return ratings
+
+
+def ask_imdb_dataset() -> Optional["ImdbRatings"]:
+    while True:
+        raw = input("Path to title.ratings.tsv.gz (from datasets.imdbws.com): ").strip().strip('"')
+        tsv = Path(raw)
+        if raw and tsv.is_file():
+            break
+        err("File not found.")
+    try:
+        info("Preparing the IMDb ratings index (first use of this file only)...")
+        ratings = ImdbRatings(tsv)
+    except Exception as e:
+        err(f"Could not read {tsv.name}: {e}")
+        warn("Using NFO files only.")
+        return None
+    ok(f"IMDb ratings for {ratings.count} titles ready.")
+    return ratings
+
+
 def ask_rating_field_global() -> str:
     print("\n" + color_hex_text("═" * 60, "#FF8C00"))
     question("Which NFO field to read rating from? (global choice for entire run)")
@@ -226,6 +724,215 @@ def ask_rating_field_global() -> str:
     return "criticrating" if choice == "2" else "rating"
 
 
+# ============================================================
+# Library walk (one os.scandir pass per directory)
+# ============================================================
+
+@dataclass
+class DirRecord:
+    """Directory with its relevant files classified from a single listing"""
+    path: Path
+    cover: Optional[Path] = None
+    nfos: List[Path] = field(default_factory=list)       # movie.nfo, tvshow.nfo, then the rest sorted
+    backups: List[Path] = field(default_factory=list)    # folder_backup.jpg, then folder_backup_*.jpg sorted
+    stats: Dict[str, Tuple[int, int]] = field(default_factory=dict)  # file name -> (st_size, st_mtime_ns)
+    show_nfo: Optional[Path] = None  # tvshow.nfo of the parent folder (season folders)
+    manifest: Optional[Path] = None  # BACKUP_MANIFEST (backups kept in the content-addressed store)
+    library: Optional[Path] = None   # root of the walk, home of the "library" backup store
+
+    def mtime(self, p: Path) -> float:
+        st = self.stats.get(p.name)
+        return st[1] / 1e9 if st else 0.0
+
+    def nfo(self, name: str) -> Optional[Path]:
+        key = os.path.normcase(name)
+        for p in self.nfos:
+            if os.path.normcase(p.name) == key:
+                return p
+        return None
+
+    @property
+    def kind(self) -> str:
+        """Jellyfin layout role: "show" root, "season" folder or "movie" (anything else)"""
+        if self.nfo(SHOW_NFO):
+            return "show"
+        if self.show_nfo is not None or self.nfo(SEASON_NFO):
+            return "season"
+        return "movie"
+
+
+# Stats key of the parent's tvshow.nfo, so a show rating change also invalidates its season folders
+_SHOW_NFO_STAT = "../" + SHOW_NFO
+
+
+def _stat_key(st: os.stat_result) -> Tuple[int, int]:
+    return st.st_size, st.st_mtime_ns
+
+
+_PREFERRED_NFOS = [os.path.normcase(n) for n in (MOVIE_NFO, SHOW_NFO)]
+
+
+def _classify_entries(d: Path, files: List[os.DirEntry],
+                      show_nfo: Optional[Tuple[Path, Tuple[int, int]]] = None) -> DirRecord:
+    rec = DirRecord(d)
+    cover_key = os.path.normcase(COVER_NAME)
+    primary_key = os.path.normcase(f"{BACKUP_PREFIX}.jpg")
+    prefix_key = os.path.normcase(BACKUP_PREFIX)
+    manifest_key = os.path.normcase(BACKUP_MANIFEST)
+
+    nfos = []
+    backups = []
+    for e in files:
+        key = os.path.normcase(e.name)
+        if key == cover_key:
+            rec.cover = d / e.name
+        elif key.endswith(".nfo"):
+            nfos.append((key, e))
+        elif key.startswith(prefix_key) and key.endswith(".jpg"):
+            backups.append((key, e))
+        elif key == manifest_key:
+            rec.manifest = d / e.name
+        else:
+            continue
+        # Free on Windows (cached from the listing), one stat elsewhere
+        try:
+            rec.stats[e.name] = _stat_key(e.stat())
+        except OSError:
+            rec.stats[e.name] = (0, 0)
+
+    nfos.sort(key=lambda kv: (_PREFERRED_NFOS.index(kv[0]) if kv[0] in _PREFERRED_NFOS else len(_PREFERRED_NFOS), kv[0]))
+    rec.nfos = [d / e.name for _, e in nfos]
+
+    # Same order as the old glob based lookup: primary, timestamped, anything else matching
+    backups.sort(key=lambda kv: (kv[0] != primary_key, not kv[0].startswith(prefix_key + "_"), kv[0]))
+    rec.backups = [d / e.name for _, e in backups]
+
+    if show_nfo is not None and rec.nfo(SHOW_NFO) is None:
+        rec.show_nfo, rec.stats[_SHOW_NFO_STAT] = show_nfo
+    return rec
+
+
+def _own_show_nfo(rec: DirRecord) -> Optional[Tuple[Path, Tuple[int, int]]]:
+    p = rec.nfo(SHOW_NFO)
+    if p is None:
+        return None
+    return p, rec.stats.get(p.name, (0, 0))
+
+
+def _list_dir(d: Path) -> Tuple[List[os.DirEntry], List[Path]]:
+    files = []
+    subdirs = []
+    with os.scandir(d) as it:
+        for e in it:
+            try:
+                if e.is_file():
+                    files.append(e)
+                elif e.is_dir() and e.name != BACKUP_STORE_DIR:  # symlinked folders too
+                    subdirs.append(Path(e.path))
+            except OSError:
+                pass
+    return files, subdirs
+
+
+def refresh_stats(rec: DirRecord):
+    """Re-stat the files of a record after they were written"""
+    for p in [rec.cover, *rec.nfos, *rec.backups, rec.manifest]:
+        if p is None:
+            continue
+        try:
+            rec.stats[p.name] = _stat_key(p.stat())
+        except OSError:
+            rec.stats.pop(p.name, None)
+    if rec.show_nfo is not None:
+        try:
+            rec.stats[_SHOW_NFO_STAT] = _stat_key(rec.show_nfo.stat())
+        except OSError:
+            rec.stats.pop(_SHOW_NFO_STAT, None)
+
+
+def _parent_show_nfo(d: Path) -> Optional[Tuple[Path, Tuple[int, int]]]:
+    p = d.parent / SHOW_NFO
+    if p == d / SHOW_NFO:
+        return None
+    try:
+        return p, _stat_key(p.stat())
+    except OSError:
+        return None
+
+
+def scan_dir(d: Path, library: Optional[Path] = None) -> DirRecord:
+    try:
+        files, _ = _list_dir(d)
+    except OSError:
+        return DirRecord(d, library=library)
+    rec = _classify_entries(d, files, _parent_show_nfo(d))
+    rec.library = library
+    return rec
+
+
+def _dir_key(d: Path) -> Optional[Tuple[int, int]]:
+    """(st_dev, st_ino) of a folder, or None when the filesystem gives no usable inode"""
+    try:
+        st = os.stat(d)
+    except OSError:
+        return None
+    return (st.st_dev, st.st_ino) if st.st_ino else None
+
+
+def _first_visit(d: Path, seen: set) -> bool:
+    # Walks follow symlinked folders: a loop, or a folder linked twice, is only visited once
+    key = _dir_key(d)
+    if key is None:
+        return True
+    if key in seen:
+        return False
+    seen.add(key)
+    return True
+
+
+def count_dirs(root: Path, recursive: bool) -> int:
+    """Number of records iter_dir_records() will yield (listing only, no stats)"""
+    if not recursive:
+        return 1
+    n = 0
+    stack = [root]
+    seen = set()
+    while stack:
+        d = stack.pop()
+        if not _first_visit(d, seen):
+            continue
+        try:
+            _, subdirs = _list_dir(d)
+        except OSError:
+            continue
+        n += 1
+        stack.extend(subdirs)
+    return n
+
+
+def iter_dir_records(root: Path, recursive: bool) -> Iterable[DirRecord]:
+    if not recursive:
+        yield scan_dir(root, library=root)
+        return
+
+    # Each folder carries its parent's tvshow.nfo, taken from the parent's listing
+    stack: List[Tuple[Path, Optional[Tuple[Path, Tuple[int, int]]]]] = [(root, _parent_show_nfo(root))]
+    seen = set()
+    while stack:
+        d, parent_show = stack.pop()
+        if not _first_visit(d, seen):
+            continue
+        try:
+            files, subdirs = _list_dir(d)
+        except OSError:
+            continue
+        rec = _classify_entries(d, files, parent_show)
+        rec.library = root
+        yield rec
+        own_show = _own_show_nfo(rec)
+        stack.extend((sub, own_show) for sub in sorted(subdirs, reverse=True))
+
+
 # ============================================================
 # Rating extraction (with fallback + info)
 # ============================================================
@@ -252,32 +959,29 @@ def _parse_float_text(s: str) -> Optional[float]:
         return None
 
 
-def _read_field_from_nfo_xml(text: str, field: str) -> Optional[float]:
-    import xml.etree.ElementTree as ET
-    root = ET.fromstring(text)
-
-    if field == "criticrating":
-        return _parse_float_text(root.findtext("criticrating"))
-
-    direct = _parse_float_text(root.findtext("rating"))
-    if direct is not None:
-        return direct
+def _ratings_candidate(rating_node) -> Optional[Tuple[Optional[str], str]]:
+    name = rating_node.attrib.get("name") if hasattr(rating_node, "attrib") else None
+    val_text = (rating_node.text or "").strip()
+    val_node = rating_node.find("value")
+    if val_node is not None and (val_node.text or "").strip():
+        val_text = (val_node.text or "").strip()
+    return (name, val_text) if val_text else None
 
-    candidates = []
-    for rating_node in root.findall(".//ratings//rating"):
-        name = rating_node.attrib.get("name") if hasattr(rating_node, "attrib") else None
-        val_text = (rating_node.text or "").strip()
-        val_node = rating_node.find("value")
-        if val_node is not None and (val_node.text or "").strip():
-            val_text = (val_node.text or "").strip()
-        if val_text:
-            candidates.append((name, val_text))
 
+def _imdb_from_ratings(candidates: List[Tuple[Optional[str], str]]) -> Optional[float]:
     for name, val in candidates:
         if name and name.strip().lower() == "imdb":
             ff = _parse_float_text(val)
             if ff is not None:
                 return ff
+    return None
+
+
+def _pick_from_ratings(candidates: List[Tuple[Optional[str], str]]) -> Optional[float]:
+    """IMDb entry of a <ratings> block first, then the first parseable one"""
+    ff = _imdb_from_ratings(candidates)
+    if ff is not None:
+        return ff
     for _, val in candidates:
         ff = _parse_float_text(val)
         if ff is not None:
@@ -286,6 +990,24 @@ def _read_field_from_nfo_xml(text: str, field: str) -> Optional[float]:
     return None
 
 
+def _read_field_from_nfo_xml(text: str, field: str) -> Optional[float]:
+    root = ET.fromstring(text)
+
+    if field == "criticrating":
+        return _parse_float_text(root.findtext("criticrating"))
+
+    direct = _parse_float_text(root.findtext("rating"))
+    if direct is not None:
+        return direct
+
+    candidates = []
+    for rating_node in root.findall(".//ratings//rating"):
+        c = _ratings_candidate(rating_node)
+        if c:
+            candidates.append(c)
+    return _pick_from_ratings(candidates)
+
+
 def _read_field_from_nfo_regex(text: str, field: str) -> Optional[float]:
     if field == "criticrating":
         m = re.search(r"<criticrating[^>]*>\s*([0-9]+(?:[.,][0-9]+)?)\s*</criticrating>", text, flags=re.IGNORECASE)
@@ -295,48 +1017,198 @@ def _read_field_from_nfo_regex(text: str, field: str) -> Optional[float]:
     return float(m.group(1).replace(",", ".")) if m else None
 
 
-def read_rating_from_nfo(nfo_path: Path, preferred_field: str, fallback: bool = True) -> Optional[Tuple[float, str, bool]]:
+_NFO_RATING_TAGS = {"rating", "criticrating", "ratings"}
+_NUMBER_ONLY_RE = re.compile(r"\s*([0-9]+(?:[.,][0-9]+)?)\s*")
+
+
+@dataclass
+class NfoScan:
+    """What the rating lookup needs from one NFO, collected in a single streaming pass"""
+    direct: Optional[str] = None        # text of the root's <rating>
+    direct_seen: bool = False
+    critic: Optional[str] = None        # text of the root's <criticrating>
+    critic_seen: bool = False
+    ratings: List[Tuple[Optional[str], str]] = field(default_factory=list)  # (name, value) from <ratings>
+    # First numeric <rating>/<criticrating> anywhere, case-insensitive: what the regex fallback would find
+    loose: Dict[str, float] = field(default_factory=dict)
+
+    def xml_value(self, fld: str) -> Optional[float]:
+        if fld == "criticrating":
+            return _parse_float_text(self.critic)
+        direct = _parse_float_text(self.direct)
+        if direct is not None:
+            return direct
+        return _pick_from_ratings(self.ratings)
+
+    def value(self, fld: str) -> Optional[float]:
+        v = self.xml_value(fld)
+        if v is not None and v > 0:
+            return v
+        return self.loose.get(fld)
+
+    def complete_for(self, preferred_field: str) -> bool:
+        # Only a positive preferred value is final: a later root <rating> still wins over <ratings>,
+        # and an IMDb entry in any later <ratings> block over the other sites seen so far
+        if preferred_field == "criticrating":
+            v = _parse_float_text(self.critic)
+        else:
+            v = _parse_float_text(self.direct)
+            if v is None and self.direct_seen:
+                v = _imdb_from_ratings(self.ratings)
+        return v is not None and v > 0
+
+
+def _scan_rating_element(scan: NfoScan, elem, tag: str, depth: int, in_ratings: bool):
+    if depth == 2 and tag == "rating" and not scan.direct_seen:
+        scan.direct_seen = True
+        scan.direct = elem.text or ""
+    elif depth == 2 and tag == "criticrating" and not scan.critic_seen:
+        scan.critic_seen = True
+        scan.critic = elem.text or ""
+
+    if tag == "rating" and in_ratings:
+        c = _ratings_candidate(elem)
+        if c:
+            scan.ratings.append(c)
+
+    low = tag.lower()
+    if low in ("rating", "criticrating") and low not in scan.loose and len(elem) == 0:
+        m = _NUMBER_ONLY_RE.fullmatch(elem.text or "")
+        if m:
+            scan.loose[low] = float(m.group(1).replace(",", "."))
+
+
+def scan_nfo(nfo_path: Path, preferred_field: str) -> Optional[NfoScan]:
+    """
+    Stream the NFO with iterparse and stop as soon as the preferred field is known to be
+    positive (its root element, or an IMDb entry when the root <rating> is empty); anything
+    else may still change further down, so the rest is read. Finished top-level elements
+    are dropped, so long cast lists / episode guides never pile up in memory.
+    Returns None when the document is not well-formed XML.
+    """
+    scan = NfoScan()
+    depth = 0
+    in_ratings = 0
+    root = None
+    root_closed = False
+    changed = False
+    try:
+        with open(nfo_path, "rb") as f:
+            for event, elem in ET.iterparse(f, events=("start", "end")):
+                if event == "start":
+                    depth += 1
+                    if root is None:
+                        root = elem
+                    if elem.tag == "ratings":
+                        in_ratings += 1
+                    continue
+
+                tag = elem.tag
+                if isinstance(tag, str) and tag.lower() in _NFO_RATING_TAGS:
+                    _scan_rating_element(scan, elem, tag, depth, in_ratings > 0)
+                    if tag == "ratings":
+                        in_ratings -= 1
+                    changed = True
+
+                depth -= 1
+                if depth == 0:
+                    root_closed = True
+                    break
+                if depth == 1:
+                    root.clear()
+                    if changed and scan.complete_for(preferred_field):
+                        break
+                    changed = False
+    except ET.ParseError:
+        # Trailing junk after the root element (e.g. a URL line) is harmless
+        if not root_closed:
+            return None
+    return scan
+
+
+def _read_rating_from_text(nfo_path: Path, fields: List[str]) -> Optional[Tuple[float, str, bool]]:
+    """Whole-document fallback for NFOs the streaming parser rejects"""
     try:
         text = nfo_path.read_text(encoding="utf-8", errors="replace")
     except Exception:
         return None
 
-    fields = [preferred_field]
-    if fallback:
-        other = "criticrating" if preferred_field == "rating" else "rating"
-        fields.append(other)
-
-    for idx, field in enumerate(fields):
+    for idx, fld in enumerate(fields):
         try:
-            v = _read_field_from_nfo_xml(text, field)
+            v = _read_field_from_nfo_xml(text, fld)
             if v is not None and v > 0:  # Skip 0.0 and values <= 0
-                return (v, field, idx == 1)
+                return (v, fld, idx == 1)
         except Exception:
             pass
 
         try:
-            v = _read_field_from_nfo_regex(text, field)
+            v = _read_field_from_nfo_regex(text, fld)
             if v is not None and v > 0:  # Skip 0.0 and values <= 0
-                return (v, field, idx == 1)
+                return (v, fld, idx == 1)
         except Exception:
             pass
 
     return None
 
 
-def find_any_nfo_with_rating(d: Path, preferred_field: str) -> Optional[Tuple[Path, float, str, bool]]:
-    candidates = []
-    preferred = [d / "movie.nfo", d / "tvshow.nfo"]
-    for p in preferred:
-        if p.exists() and p.is_file():
-            candidates.append(p)
+def read_rating_from_nfo(nfo_path: Path, preferred_field: str, fallback: bool = True) -> Optional[Tuple[float, str, bool]]:
+    fields = [preferred_field]
+    if fallback:
+        other = "criticrating" if preferred_field == "rating" else "rating"
+        fields.append(other)
+
+    try:
+        scan = scan_nfo(nfo_path, preferred_field)
+    except Exception:
+        return None
+    if scan is None:
+        return _read_rating_from_text(nfo_path, fields)
+
+    for idx, fld in enumerate(fields):
+        v = scan.value(fld)
+        if v is not None and v > 0:  # Skip 0.0 and values <= 0
+            return (v, fld, idx == 1)
+    return None
 
-    for p in sorted(d.glob("*.nfo")):
-        if p.is_file() and p not in candidates:
-            candidates.append(p)
 
-    for p in candidates:
-        out = read_rating_from_nfo(p, preferred_field=preferred_field, fallback=True)
+# Show-level ratings, shared by all season folders of a show handled by this process
+_SHOW_RATINGS: Dict[Tuple[str, int, int, str], Optional[Tuple[float, str, bool]]] = {}
+
+
+def _show_rating(p: Path, st: Tuple[int, int], preferred_field: str) -> Optional[Tuple[float, str, bool]]:
+    key = (str(p), st[0], st[1], preferred_field)
+    if key not in _SHOW_RATINGS:
+        _SHOW_RATINGS[key] = read_rating_from_nfo(p, preferred_field=preferred_field, fallback=True)
+    return _SHOW_RATINGS[key]
+
+
+def nfo_candidates(rec: DirRecord) -> List[Path]:
+    """NFOs to try, in order, for the folder's role in the Jellyfin layout"""
+    kind = rec.kind
+    if kind == "show":
+        out = [rec.nfo(SHOW_NFO)]
+        if READ_EPISODE_NFOS:
+            out += [p for p in rec.nfos if p not in out]
+        return out
+
+    if kind == "season":
+        season = rec.nfo(SEASON_NFO)
+        out = [season] if season else []
+        if rec.show_nfo is not None:
+            out.append(rec.show_nfo)
+        if READ_EPISODE_NFOS:
+            out += [p for p in rec.nfos if p != season]
+        return out
+
+    return list(rec.nfos)
+
+
+def find_any_nfo_with_rating(rec: DirRecord, preferred_field: str) -> Optional[Tuple[Path, float, str, bool]]:
+    for p in nfo_candidates(rec):
+        if p == rec.show_nfo:
+            out = _show_rating(p, rec.stats.get(_SHOW_NFO_STAT, (0, 0)), preferred_field)
+        else:
+            out = read_rating_from_nfo(p, preferred_field=preferred_field, fallback=True)
         if out is not None:
             v, used_field, used_fallback = out
             return p, v, used_field, used_fallback
@@ -345,117 +1217,643 @@ def find_any_nfo_with_rating(d: Path, preferred_field: str) -> Optional[Tuple[Pa
 
 
 # ============================================================
-# EXIF marker helpers
+# Rating sources besides NFO files (Jellyfin database, IMDb dataset)
 # ============================================================
 
-def _exif_get_desc(img: Image.Image) -> str:
-    try:
-        exif = img.getexif()
-        return str(exif.get(270, "") or "")
-    except Exception:
-        return ""
+class RatingSource(abc.ABC):
+    """Ratings from outside the folder. Picklable: pool workers get a copy through the initializer"""
 
+    @abc.abstractmethod
+    def lookup(self, rec: DirRecord, preferred_field: str) -> Optional[Tuple[Path, float, str, bool]]:
+        """(source file, value, field used, used fallback) or None to try the next source / the NFOs"""
 
-def image_has_marker(path: Path) -> bool:
-    try:
-        img = Image.open(path)
-        desc = _exif_get_desc(img)
-        return EXIF_MARKER in desc
-    except Exception:
-        return False
+    @abc.abstractmethod
+    def signature(self, rec: DirRecord):
+        """JSON-able value that changes when this source's answer for the folder may have changed"""
 
 
-def exif_set_marker(exif, extra: str = ""):
-    try:
-        current = str(exif.get(270, "") or "")
-        if EXIF_MARKER not in current:
-            new_val = (current + " " + EXIF_MARKER + (" " + extra if extra else "")).strip()
-            exif[270] = new_val
-    except Exception:
-        pass
-    return exif
+# Item types whose Path is a media file: the folder is its parent. Episodes are not folder covers.
+_FILE_ITEM_TYPES = {"Movie", "MusicVideo", "Video", "Trailer"}
+_SKIP_ITEM_TYPES = {"Episode", "Audio", "Photo"}
+_MEDIA_EXT_RE = re.compile(r"\.[A-Za-z0-9]{1,5}")
 
 
-# ============================================================
-# Image similarity (structure + color distribution)
-# ============================================================
+def _path_key(p: str) -> str:
+    return os.path.normcase(os.path.abspath(p))
+
 
-def average_hash_16x16(path: Path) -> Optional[int]:
+def map_jellyfin_path(p: str, path_map: List[Tuple[str, str]]) -> str:
+    """Translate a path as Jellyfin stores it to this machine (first matching prefix wins)"""
+    s = p.replace("\\", "/")
+    for src, dst in path_map:
+        src = src.replace("\\", "/").rstrip("/")
+        if s == src or s.startswith(src + "/"):
+            return dst.rstrip("/\\") + s[len(src):]
+    return s
+
+
+class JellyfinRatings(RatingSource):
     """
-    Uses get_flattened_data() instead of deprecated getdata()
+    Folder -> (CommunityRating, CriticRating) for a whole library, read in one query from a
+    copy of Jellyfin's database: library.db (TypedBaseItems) or jellyfin.db (BaseItems, 10.11+).
+    Folders it has no rating for fall back to their NFOs.
     """
-    try:
-        img = Image.open(path).convert("L")
-        img = ImageOps.fit(img, (16, 16), method=Image.Resampling.LANCZOS)
 
-        # Pillow: getdata() deprecated -> get_flattened_data()
-        pixels = list(img.get_flattened_data())
-        avg = sum(pixels) / len(pixels)
+    def __init__(self, db_path: Path, path_map: Optional[List[Tuple[str, str]]] = None):
+        self.source = Path(db_path)
+        self.path_map = list(path_map or [])
+        self.ratings: Dict[str, Tuple[Optional[float], Optional[float]]] = {}
+        self.series = set()  # keys of series folders, whose subfolders (seasons) inherit their rating
+        self._load()
 
-        bits = 0
-        for p in pixels:
-            bits = (bits << 1) | (1 if p >= avg else 0)
-        return bits
-    except Exception:
+    def _load(self):
+        # Work on a private copy (with its WAL) so a running Jellyfin is never locked or modified
+        tmp = Path(tempfile.mkdtemp(prefix="jf-ratings-"))
+        try:
+            copy = tmp / self.source.name
+            shutil.copyfile(self.source, copy)
+            wal = self.source.with_name(self.source.name + "-wal")
+            if wal.exists():
+                shutil.copyfile(wal, tmp / wal.name)
+            db = sqlite3.connect(str(copy))
+            try:
+                db.execute("PRAGMA query_only = ON")
+                rows = db.execute(self._query(db)).fetchall()
+            finally:
+                db.close()
+        finally:
+            shutil.rmtree(tmp, ignore_errors=True)
+
+        ambiguous = set()
+        for item_type, path, community, critic in rows:
+            kind = (item_type or "").rsplit(".", 1)[-1]
+            if kind in _SKIP_ITEM_TYPES:
+                continue
+            local = map_jellyfin_path(path, self.path_map)
+            if kind in _FILE_ITEM_TYPES and _MEDIA_EXT_RE.fullmatch(posixpath.splitext(local)[1]):
+                local = posixpath.dirname(local)
+            key = _path_key(local)
+            if key in self.ratings and kind not in ("Series", "Season"):
+                ambiguous.add(key)  # several movies in one folder: which one the cover belongs to is unknown
+                continue
+            self.ratings[key] = (community, critic)
+            if kind == "Series":
+                self.series.add(key)
+        for key in ambiguous:
+            self.ratings.pop(key, None)
+
+    @staticmethod
+    def _query(db: sqlite3.Connection) -> str:
+        tables = {row[0] for row in db.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+        for table, type_col in (("BaseItems", "Type"), ("TypedBaseItems", "type")):
+            if table in tables:
+                return (
+                    f"SELECT {type_col}, Path, CommunityRating, CriticRating FROM {table}"
+                    " WHERE Path IS NOT NULL AND (CommunityRating > 0 OR CriticRating > 0)"
+                )
+        raise ValueError("not a Jellyfin library database (no BaseItems / TypedBaseItems table)")
+
+    def entry(self, d: Path) -> Optional[Tuple[Optional[float], Optional[float]]]:
+        key = _path_key(str(d))
+        if key in self.ratings:
+            return self.ratings[key]
+        parent = _path_key(str(d.parent))
+        if parent in self.series:
+            return self.ratings[parent]
+        return None
+
+    def lookup(self, rec: DirRecord, preferred_field: str) -> Optional[Tuple[Path, float, str, bool]]:
+        e = self.entry(rec.path)
+        if e is None:
+            return None
+        values = {"rating": e[0], "criticrating": e[1]}
+        other = "criticrating" if preferred_field == "rating" else "rating"
+        for idx, fld in enumerate((preferred_field, other)):
+            v = values[fld]
+            if v is not None and v > 0:
+                return self.source, float(v), fld, idx == 1
         return None
 
+    def signature(self, rec: DirRecord):
+        return self.entry(rec.path)
 
-def hamming_distance(a: int, b: int) -> int:
-    return (a ^ b).bit_count()
+
+_IMDB_ID_RE = re.compile(r"tt(\d{1,10})")
+_IMDB_ID_TEXT_RE = re.compile(
+    r"<(?:uniqueid[^>]*type=[\"']imdb[\"'][^>]*|imdbid|imdb_id|id)>\s*(tt\d{1,10})\s*<", re.IGNORECASE
+)
+_IMDB_MAGIC = b"JRCBIMDB"
+_IMDB_HEADER = struct.Struct("<8sI")  # magic, record count
+_IMDB_RECORD = struct.Struct("<IB")   # numeric part of tconst, rating * 10
+_IMDB_MAX_KEY = 0xFFFFFFFF            # larger tconsts do not fit a record and are left out
 
 
-def normalized_rgb_hist(path: Path, bins_per_channel: int = 16) -> Optional[List[float]]:
+def read_imdb_id(nfo_path: Path) -> Optional[str]:
+    """First IMDb id in <uniqueid type="imdb">, <imdbid> or <id> (stops reading there)"""
     try:
-        img = Image.open(path).convert("RGB")
-        img = ImageOps.fit(img, (256, 256), method=Image.Resampling.LANCZOS)
-        h = img.histogram()
-        if len(h) != 768:
-            return None
+        for _, elem in ET.iterparse(str(nfo_path), events=("end",)):
+            tag = elem.tag.lower() if isinstance(elem.tag, str) else ""
+            if tag in ("uniqueid", "imdbid", "imdb_id", "id"):
+                if tag != "uniqueid" or (elem.get("type") or "").lower() == "imdb":
+                    text = (elem.text or "").strip()
+                    if _IMDB_ID_RE.fullmatch(text):
+                        return text
+            elem.clear()
+        return None
+    except ET.ParseError:
+        pass
+    except OSError:
+        return None
+    try:
+        m = _IMDB_ID_TEXT_RE.search(nfo_path.read_text(encoding="utf-8", errors="ignore"))
+    except OSError:
+        return None
+    return m.group(1) if m else None
+
+
+def build_imdb_index(tsv: Path, out: Path) -> int:
+    """Sorted (tconst, rating) records from title.ratings.tsv(.gz); returns the record count"""
+    opener = gzip.open if tsv.suffix.lower() == ".gz" else open
+    records = []
+    with opener(tsv, "rt", encoding="utf-8") as f:
+        header = f.readline().rstrip("\n").split("\t")
+        id_col, rating_col = header.index("tconst"), header.index("averageRating")
+        for line in f:
+            cols = line.split("\t")
+            if len(cols) <= max(id_col, rating_col):
+                continue
+            m = _IMDB_ID_RE.fullmatch(cols[id_col])
+            if not m or int(m.group(1)) > _IMDB_MAX_KEY:
+                continue
+            try:
+                r10 = int(round(float(cols[rating_col]) * 10))
+            except ValueError:
+                continue
+            if 0 < r10 <= 100:
+                records.append((int(m.group(1)), r10))
+    records.sort()
+    buf = bytearray(_IMDB_HEADER.size + _IMDB_RECORD.size * len(records))
+    _IMDB_HEADER.pack_into(buf, 0, _IMDB_MAGIC, len(records))
+    off = _IMDB_HEADER.size
+    for key, r10 in records:
+        _IMDB_RECORD.pack_into(buf, off, key, r10)
+        off += _IMDB_RECORD.size
+    write_bytes_atomic(out, bytes(buf))
+    return len(records)
+
+
+class ImdbRatings(RatingSource):
+    """
+    IMDb user ratings from a local title.ratings.tsv(.gz) dump, looked up by the IMDb id in the
+    folder's NFO. The dump is turned into a sorted binary index once (cached per dump file) and
+    memory-mapped, so every lookup is a binary search.
+    """
 
-        def downbin(channel_hist_256):
-            step = 256 // bins_per_channel
-            out = []
-            for i in range(0, 256, step):
-                out.append(sum(channel_hist_256[i:i + step]))
-            return out
-
-        r = downbin(h[0:256])
-        g = downbin(h[256:512])
-        b = downbin(h[512:768])
-        vec = r + g + b
-        s = float(sum(vec))
-        if s <= 0:
+    def __init__(self, tsv: Path, index_dir: Optional[Path] = None):
+        self.source = Path(tsv)
+        st = self.source.stat()
+        ident = f"{os.path.abspath(tsv)}|{st.st_size}|{st.st_mtime_ns}"
+        self.version = hashlib.sha1(ident.encode("utf-8")).hexdigest()[:12]
+        index_dir = index_dir or cache_dir()
+        index_dir.mkdir(parents=True, exist_ok=True)
+        self.index_path = index_dir / f"imdb-ratings-{self.version}.bin"
+        if not self.index_path.exists():
+            build_imdb_index(self.source, self.index_path)
+            # Indexes of earlier dumps are never read again
+            for old in index_dir.glob("imdb-ratings-*.bin"):
+                if old != self.index_path:
+                    try:
+                        old.unlink()
+                    except OSError:
+                        pass  # still mapped by another process (Windows)
+        self._mm: Optional[mmap.mmap] = None
+        self._ids: Dict[Tuple[str, Optional[Tuple[int, int]]], Optional[str]] = {}
+        self.count = self._map()[1]
+
+    def __getstate__(self):
+        state = dict(self.__dict__)
+        state["_mm"] = None
+        state["_ids"] = {}
+        return state
+
+    def _map(self) -> Tuple[mmap.mmap, int]:
+        if self._mm is None:
+            with open(self.index_path, "rb") as f:
+                self._mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, count = _IMDB_HEADER.unpack_from(self._mm, 0)
+        if magic != _IMDB_MAGIC:
+            raise ValueError(f"{self.index_path.name} is not an IMDb ratings index")
+        return self._mm, count
+
+    def rating_for(self, imdb_id: str) -> Optional[float]:
+        m = _IMDB_ID_RE.fullmatch(imdb_id)
+        if not m:
             return None
-        return [v / s for v in vec]
-    except Exception:
+        key = int(m.group(1))
+        mm, count = self._map()
+        lo, hi = 0, count
+        while lo < hi:
+            mid = (lo + hi) // 2
+            k, r10 = _IMDB_RECORD.unpack_from(mm, _IMDB_HEADER.size + mid * _IMDB_RECORD.size)
+            if k < key:
+                lo = mid + 1
+            elif k > key:
+                hi = mid
+            else:
+                return r10 / 10
         return None
 
+    def imdb_id(self, rec: DirRecord) -> Optional[str]:
+        # Season folders usually carry no id of their own and end at the show's tvshow.nfo
+        for p in nfo_candidates(rec):
+            key = (str(p), rec.stats.get(_SHOW_NFO_STAT if p == rec.show_nfo else p.name))
+            if key not in self._ids:
+                self._ids[key] = read_imdb_id(p)
+            if self._ids[key]:
+                return self._ids[key]
+        return None
+
+    def lookup(self, rec: DirRecord, preferred_field: str) -> Optional[Tuple[Path, float, str, bool]]:
+        if preferred_field != "rating":
+            return None  # IMDb has user ratings only; <criticrating> comes from the NFOs
+        imdb_id = self.imdb_id(rec)
+        v = self.rating_for(imdb_id) if imdb_id else None
+        if v is None:
+            return None
+        return self.source, v, "rating", False
+
+    def signature(self, rec: DirRecord):
+        # The NFOs are already part of the signature; only a new dump can change the answer
+        return self.version
+
+
+# Extra rating sources of this process, tried before the folder's NFOs (set by _init_burn_worker)
+_RATING_SOURCES: List[RatingSource] = []
+
+
+def find_rating(rec: DirRecord, preferred_field: str) -> Optional[Tuple[Path, float, str, bool]]:
+    for source in _RATING_SOURCES:
+        found = source.lookup(rec, preferred_field)
+        if found is not None:
+            return found
+    return find_any_nfo_with_rating(rec, preferred_field=preferred_field)
+
+
+# ============================================================
+# EXIF marker helpers
+# ============================================================
+
+def _exif_get_desc(img: Image.Image) -> str:
+    try:
+        exif = img.getexif()
+        return str(exif.get(270, "") or "")
+    except Exception:
+        return ""
+
+
+_MARKER_RE = re.compile(re.escape(EXIF_MARKER.encode("ascii")) + rb"(?: ([^\x00]*))?")
+_MARKER_MEMO: Dict[Tuple[str, int, int], Optional[str]] = {}
+_MARKER_MEMO_MAX = 100_000
+
+
+def _jpeg_exif_segment(path: Path) -> Optional[bytes]:
+    """
+    APP1 Exif payload read from the JPEG header (b"" if there is none).
+    None when the file is not a JPEG we can walk, so the caller falls back to Pillow.
+    """
+    with open(path, "rb") as f:
+        if f.read(2) != b"\xff\xd8":
+            return None
+        while True:
+            b = f.read(1)
+            if not b:
+                return None
+            if b != b"\xff":
+                return None
+            code = f.read(1)
+            while code == b"\xff":  # fill bytes
+                code = f.read(1)
+            if not code:
+                return None
+            c = code[0]
+            if c == 0xDA or c == 0xD9:  # start of scan / end of image: no more metadata
+                return b""
+            if c == 0x01 or 0xD0 <= c <= 0xD7:  # markers without a length
+                continue
+            size = f.read(2)
+            if len(size) != 2:
+                return None
+            length = int.from_bytes(size, "big") - 2
+            if length < 0:
+                return None
+            if c == 0xE1:
+                data = f.read(length)
+                if data.startswith(b"Exif\x00\x00"):
+                    return data
+            else:
+                f.seek(length, 1)
+
+
+def read_marker(path: Path, st: Optional[Tuple[int, int]] = None) -> Optional[str]:
+    """
+    Text after EXIF_MARKER in the image description ("" when there is none),
+    or None when the image carries no marker. Memoized per (path, size, mtime).
+    """
+    try:
+        if st is None:
+            st = _stat_key(path.stat())
+    except OSError:
+        return None
+    key = (str(path), st[0], st[1])
+    if key in _MARKER_MEMO:
+        return _MARKER_MEMO[key]
+
+    try:
+        seg = _jpeg_exif_segment(path)
+        if seg is None:
+            with Image.open(path) as img:
+                seg = _exif_get_desc(img).encode("utf-8", "replace")
+        m = _MARKER_RE.search(seg)
+        payload = (m.group(1) or b"").decode("utf-8", "replace").strip() if m else None
+    except Exception:
+        payload = None
+
+    if len(_MARKER_MEMO) >= _MARKER_MEMO_MAX:
+        _MARKER_MEMO.clear()
+    _MARKER_MEMO[key] = payload
+    return payload
+
+
+def image_has_marker(path: Path, st: Optional[Tuple[int, int]] = None) -> bool:
+    return read_marker(path, st) is not None
+
+
+def build_marker_payload(used_field: str, rating_text: str, cfg_key: str, base_name: str) -> str:
+    return f"field={used_field};rating={rating_text};cfg={cfg_key};base={base_name}"
+
+
+def parse_marker_payload(payload: str) -> Dict[str, str]:
+    out = {}
+    for part in payload.split(";"):
+        k, sep, v = part.partition("=")
+        if sep:
+            out[k.strip()] = v.strip()
+    return out
+
+
+def exif_set_marker(exif, extra: str = ""):
+    try:
+        current = str(exif.get(270, "") or "")
+        if EXIF_MARKER not in current:
+            new_val = (current + " " + EXIF_MARKER + (" " + extra if extra else "")).strip()
+            exif[270] = new_val
+    except Exception:
+        pass
+    return exif
+
+
+# ============================================================
+# Image decoding (reduced scale)
+# ============================================================
+
+def open_image_for_size(path: Union[Path, BinaryIO], size: Tuple[int, int], mode: str = "RGB",
+                        oversample: int = 1) -> Image.Image:
+    """
+    Open and decode `path` at the smallest scale whose width and height are still
+    >= size * oversample. JPEG scales in the DCT domain (draft), other formats use reduce().
+    """
+    img = Image.open(path)
+    if not DRAFT_DECODE:
+        return img.convert(mode)
+
+    want = (size[0] * oversample, size[1] * oversample)
+    if img.format == "JPEG":
+        img.draft(mode, want)
+        return img.convert(mode)
+
+    img = img.convert(mode)
+    factor = min(img.width // want[0], img.height // want[1])
+    if factor >= 2:
+        img = img.reduce(factor)
+    return img
+
+
+def _image_diff_stats(a: Image.Image, b: Image.Image) -> Tuple[float, int]:
+    h = ImageChops.difference(a, b).histogram()
+    total = sum(h)
+    mean = sum((i % 256) * c for i, c in enumerate(h)) / total if total else 0.0
+    peak = max((i % 256 for i, c in enumerate(h) if c), default=0)
+    return mean, peak
+
+
+def draft_decode_drift(path: Path) -> Tuple[float, int]:
+    """(mean, max) per-channel difference between the full-resolution and reduced-scale cover render"""
+    with Image.open(path) as full_img:
+        full = ImageOps.fit(full_img.convert("RGB"), TARGET_SIZE, method=Image.Resampling.LANCZOS, centering=(0.5, 0.5))
+    return _image_diff_stats(full, open_fit_cover(path))
+
+
+# ============================================================
+# Image similarity (structure + color distribution)
+# ============================================================
+
+class Fingerprint(NamedTuple):
+    ahash: int                # 16x16 average hash (256 bits)
+    hist: Tuple[float, ...]   # normalized RGB histogram, 16 bins per channel
+
+
+def average_hash_16x16(img: Image.Image) -> int:
+    """
+    Uses get_flattened_data() instead of deprecated getdata()
+    """
+    img = ImageOps.fit(img.convert("L"), (16, 16), method=Image.Resampling.LANCZOS)
+
+    # Pillow: getdata() deprecated -> get_flattened_data()
+    pixels = list(img.get_flattened_data())
+    avg = sum(pixels) / len(pixels)
 
-def hist_l1_distance(a: List[float], b: List[float]) -> float:
+    bits = 0
+    for p in pixels:
+        bits = (bits << 1) | (1 if p >= avg else 0)
+    return bits
+
+
+def hamming_distance(a: int, b: int) -> int:
+    return (a ^ b).bit_count()
+
+
+def normalized_rgb_hist(img: Image.Image, bins_per_channel: int = 16) -> Optional[Tuple[float, ...]]:
+    img = ImageOps.fit(img, (256, 256), method=Image.Resampling.LANCZOS)
+    h = img.histogram()
+    if len(h) != 768:
+        return None
+
+    def downbin(channel_hist_256):
+        step = 256 // bins_per_channel
+        out = []
+        for i in range(0, 256, step):
+            out.append(sum(channel_hist_256[i:i + step]))
+        return out
+
+    r = downbin(h[0:256])
+    g = downbin(h[256:512])
+    b = downbin(h[512:768])
+    vec = r + g + b
+    s = float(sum(vec))
+    if s <= 0:
+        return None
+    return tuple(v / s for v in vec)
+
+
+def hist_l1_distance(a: Tuple[float, ...], b: Tuple[float, ...]) -> float:
     return sum(abs(x - y) for x, y in zip(a, b)) / 2.0
 
 
-def images_very_different(a_path: Path, b_path: Path) -> bool:
-    ha = average_hash_16x16(a_path)
-    hb = average_hash_16x16(b_path)
-    if ha is not None and hb is not None:
-        if hamming_distance(ha, hb) >= AHASH_THRESHOLD_BITS:
-            return True
+def image_fingerprint(path: Path) -> Optional[Fingerprint]:
+    """aHash + histogram from a single (reduced-scale) decode"""
+    try:
+        img = open_image_for_size(path, (256, 256))
+        hist = normalized_rgb_hist(img)
+        if hist is None:
+            return None
+        return Fingerprint(average_hash_16x16(img), hist)
+    except Exception:
+        return None
 
-    ah = normalized_rgb_hist(a_path)
-    bh = normalized_rgb_hist(b_path)
-    if ah is not None and bh is not None and len(ah) == len(bh):
-        if hist_l1_distance(ah, bh) >= HIST_THRESHOLD:
-            return True
 
+def fingerprints_very_different(a: Fingerprint, b: Fingerprint) -> bool:
+    if hamming_distance(a.ahash, b.ahash) >= AHASH_THRESHOLD_BITS:
+        return True
+    if len(a.hist) == len(b.hist) and hist_l1_distance(a.hist, b.hist) >= HIST_THRESHOLD:
+        return True
     return False
 
 
+def images_very_different(a_path: Path, b_path: Path) -> bool:
+    fa = image_fingerprint(a_path)
+    fb = image_fingerprint(b_path)
+    if fa is None or fb is None:
+        return False
+    return fingerprints_very_different(fa, fb)
+
+
+# ============================================================
+# Persistent caches
+# ============================================================
+
+def cache_dir() -> Path:
+    if sys.platform == "win32":
+        base = os.environ.get("LOCALAPPDATA") or str(Path.home() / "AppData" / "Local")
+    else:
+        base = os.environ.get("XDG_CACHE_HOME") or str(Path.home() / ".cache")
+    p = Path(base) / APP_NAME
+    p.mkdir(parents=True, exist_ok=True)
+    return p
+
+
+def fingerprint_decode_mode() -> str:
+    """How image_fingerprint() decodes right now; cached fingerprints only hold for the same mode"""
+    # DRAFT_OVERSAMPLE is part of it too, so retuning the draft decode never reuses older values
+    return f"draft-x{DRAFT_OVERSAMPLE}" if DRAFT_DECODE else "full"
+
+
+class FingerprintCache:
+    """Fingerprints of backup files keyed by path and decode mode, valid while size and mtime match"""
+
+    def __init__(self, path: Optional[Path] = None):
+        self.path = path or (cache_dir() / FINGERPRINT_DB_NAME)
+        # Pool workers share the file, so wait on locks instead of failing
+        self.db = sqlite3.connect(str(self.path), timeout=30)
+        self.db.execute("PRAGMA journal_mode=WAL")
+        columns = {row[1] for row in self.db.execute("PRAGMA table_info(fingerprints)")}
+        if columns and "decode" not in columns:
+            # Written before the decode mode was part of the key: which mode made them is unknown
+            self.db.execute("DROP TABLE IF EXISTS fingerprints")
+        self.db.execute(
+            "CREATE TABLE IF NOT EXISTS fingerprints ("
+            " path TEXT, decode TEXT, size INTEGER, mtime_ns INTEGER, ahash TEXT, hist BLOB,"
+            " PRIMARY KEY (path, decode))"
+        )
+
+    @staticmethod
+    def _key(p: Path) -> str:
+        return os.path.normcase(os.path.abspath(p))
+
+    def get(self, p: Path, st: Tuple[int, int]) -> Optional[Fingerprint]:
+        row = self.db.execute(
+            "SELECT ahash, hist FROM fingerprints WHERE path = ? AND decode = ? AND size = ? AND mtime_ns = ?",
+            (self._key(p), fingerprint_decode_mode(), st[0], st[1]),
+        ).fetchone()
+        if not row:
+            return None
+        hist = struct.unpack(f"<{len(row[1]) // 8}d", row[1])
+        return Fingerprint(int(row[0], 16), hist)
+
+    def put(self, p: Path, st: Tuple[int, int], fp: Fingerprint):
+        self.db.execute(
+            "INSERT OR REPLACE INTO fingerprints (path, decode, size, mtime_ns, ahash, hist)"
+            " VALUES (?, ?, ?, ?, ?, ?)",
+            (self._key(p), fingerprint_decode_mode(), st[0], st[1], format(fp.ahash, "x"),
+             struct.pack(f"<{len(fp.hist)}d", *fp.hist)),
+        )
+        self.db.commit()
+
+
+_FP_LOCAL = threading.local()
+_FP_CACHE_FAILED = False
+
+
+def fingerprint_cache() -> Optional[FingerprintCache]:
+    """Per-thread cache connection, or None when disabled / the cache dir is not writable"""
+    global _FP_CACHE_FAILED
+    if not FINGERPRINT_CACHE or _FP_CACHE_FAILED:
+        return None
+    cache = getattr(_FP_LOCAL, "cache", None)
+    # A forked pool worker inherits the parent's connection, which must not be used across the fork
+    if cache is None or _FP_LOCAL.pid != os.getpid():
+        try:
+            cache = FingerprintCache()
+        except Exception:
+            _FP_CACHE_FAILED = True
+            return None
+        _FP_LOCAL.cache, _FP_LOCAL.pid = cache, os.getpid()
+    return cache
+
+
+def cached_fingerprint(p: Path, st: Optional[Tuple[int, int]]) -> Optional[Fingerprint]:
+    cache = fingerprint_cache() if st else None
+    if cache is not None:
+        try:
+            fp = cache.get(p, st)
+            if fp is not None:
+                return fp
+        except sqlite3.Error:
+            pass
+
+    fp = image_fingerprint(p)
+    if fp is not None and cache is not None:
+        try:
+            cache.put(p, st, fp)
+        except sqlite3.Error:
+            pass
+    return fp
+
+
 # ============================================================
 # Drawing
 # ============================================================
 
+_FONT_CACHE: Dict[int, ImageFont.FreeTypeFont] = {}
+
+
 def load_font(size: int) -> ImageFont.FreeTypeFont:
+    font = _FONT_CACHE.get(size)
+    if font is None:
+        font = _FONT_CACHE[size] = _load_font_uncached(size)
+    return font
+
+
+def _load_font_uncached(size: int) -> ImageFont.FreeTypeFont:
     candidates = [
         r"C:\Windows\Fonts\arialbd.ttf",
         r"C:\Windows\Fonts\arial.ttf",
@@ -497,28 +1895,26 @@ def parse_hex_rgba(hex_color: str) -> Tuple[int, int, int, int]:
     return (r, g, b, 255)
 
 
-def draw_badge_bottom_right(base_rgb: Image.Image, rating_text: str, cfg: Dict) -> Image.Image:
-    base_rgba = base_rgb.convert("RGBA")
-    overlay = Image.new("RGBA", base_rgba.size, (0, 0, 0, 0))
-    d = ImageDraw.Draw(overlay)
+@dataclass
+class BadgeTile:
+    image: Image.Image  # RGBA, (width + 1) x (height + 1) because the rectangle includes its end point
+    width: int
+    height: int
 
+
+def render_badge_tile(rating_text: str, cfg: Dict) -> BadgeTile:
+    """Draw the badge on its own transparent tile, with (0, 0) as the badge's top-left corner"""
     font = load_font(cfg["font_size"])
-    bbox = d.textbbox((0, 0), rating_text, font=font)
+    bbox = ImageDraw.Draw(Image.new("RGBA", (1, 1))).textbbox((0, 0), rating_text, font=font)
     text_w = bbox[2] - bbox[0]
     text_h = bbox[3] - bbox[1]
 
     badge_h = max(cfg["star_size"], text_h) + 2 * cfg["inner_pad_y"]
     badge_w = cfg["star_size"] + cfg["star_text_gap"] + text_w + 2 * cfg["inner_pad_x"]
 
-    x2 = base_rgba.width - cfg["offset_right"]
-    y2 = base_rgba.height - cfg["offset_bottom"]
-    x1 = x2 - badge_w
-    y1 = y2 - badge_h
-
-    if x1 < 0:
-        x1, x2 = 0, badge_w
-    if y1 < 0:
-        y1, y2 = 0, badge_h
+    tile = Image.new("RGBA", (badge_w + 1, badge_h + 1), (0, 0, 0, 0))
+    d = ImageDraw.Draw(tile)
+    x1, y1, x2, y2 = 0, 0, badge_w, badge_h
 
     # Set corners based on user configuration
     # Pillow order: (top-left, top-right, bottom-right, bottom-left)
@@ -550,165 +1946,1529 @@ def draw_badge_bottom_right(base_rgb: Image.Image, rating_text: str, cfg: Dict)
     ty = y1 + (badge_h - text_h) / 2.0 - bbox[1]
     d.text((tx, ty), rating_text, font=font, fill=cfg["text_color"])
 
-    composed = Image.alpha_composite(base_rgba, overlay)
-    return composed.convert("RGB")
+    return BadgeTile(tile, badge_w, badge_h)
+
+
+class BadgeAtlas:
+    """Finished badge tiles for one render config, keyed by rating text"""
+
+    def __init__(self, cfg: Dict):
+        self.cfg = cfg
+        self.tiles: Dict[str, BadgeTile] = {}
+
+    def prebuild(self):
+        # Every text format_1_decimal() yields for a 0-10 rating; criticrating (0-100) tiles are added on demand
+        for i in range(101):
+            self.tile(f"{i / 10:.1f}")
+
+    def tile(self, rating_text: str) -> BadgeTile:
+        t = self.tiles.get(rating_text)
+        if t is None:
+            t = self.tiles[rating_text] = render_badge_tile(rating_text, self.cfg)
+        return t
+
+
+_ATLASES: Dict[str, BadgeAtlas] = {}
+
+
+def badge_atlas(cfg: Dict) -> BadgeAtlas:
+    key = cfg_fingerprint(cfg)
+    atlas = _ATLASES.get(key)
+    if atlas is None:
+        atlas = _ATLASES[key] = BadgeAtlas(cfg)
+    return atlas
+
+
+def draw_badge_bottom_right(base_rgb: Image.Image, rating_text: str, cfg: Dict) -> Image.Image:
+    """Blend the badge into base_rgb in place; only the badge box is converted and composited"""
+    tile = badge_atlas(cfg).tile(rating_text)
+
+    x1 = base_rgb.width - cfg["offset_right"] - tile.width
+    y1 = base_rgb.height - cfg["offset_bottom"] - tile.height
+    x1 = max(0, x1)
+    y1 = max(0, y1)
+    x2 = min(base_rgb.width, x1 + tile.image.width)
+    y2 = min(base_rgb.height, y1 + tile.image.height)
+    if x2 <= x1 or y2 <= y1:
+        return base_rgb
+
+    src = tile.image
+    if src.size != (x2 - x1, y2 - y1):
+        src = src.crop((0, 0, x2 - x1, y2 - y1))
+
+    region = base_rgb.crop((x1, y1, x2, y2)).convert("RGBA")
+    region.alpha_composite(src)
+    base_rgb.paste(region.convert("RGB"), (x1, y1))
+    return base_rgb
+
+
+# ============================================================
+# File cloning + content-addressed backup store (see BACKUP_STORE)
+# ============================================================
+
+_FICLONE = 0x40049409  # Linux ioctl: share the source's extents (btrfs, XFS, ...)
+
+
+def _temp_sibling(p: Path) -> Path:
+    return p.with_name(f".{p.name}.{os.getpid()}-{threading.get_ident()}.tmp")
+
+
+def _replace_from_temp(p: Path, fill: Callable[[Path], object]):
+    """Build `p` under a temp name and rename it into place (a linked file is never rewritten in place)"""
+    tmp = _temp_sibling(p)
+    try:
+        fill(tmp)
+        os.replace(tmp, p)
+    except BaseException:
+        try:
+            tmp.unlink()
+        except OSError:
+            pass
+        raise
+
+
+def write_bytes_atomic(p: Path, data: bytes):
+    _replace_from_temp(p, lambda tmp: tmp.write_bytes(data))
+
+
+def _reflink(src: Path, dst: Path) -> bool:
+    try:
+        import fcntl
+    except ImportError:
+        return False
+    try:
+        with open(src, "rb") as fs, open(dst, "wb") as fd:
+            fcntl.ioctl(fd.fileno(), _FICLONE, fs.fileno())
+    except OSError:
+        try:
+            dst.unlink()
+        except OSError:
+            pass
+        return False
+    shutil.copystat(src, dst)
+    return True
+
+
+def _link_or_copy(src: Path, dst: Path) -> str:
+    if _reflink(src, dst):
+        return "reflink"
+    if BACKUP_HARDLINKS:
+        try:
+            os.link(src, dst)
+            return "hardlink"
+        except OSError:
+            pass
+    shutil.copy2(src, dst)
+    return "copy"
+
+
+def clone_file(src: Path, dst: Path) -> str:
+    """Replace dst with src's content: reflink, hard link (BACKUP_HARDLINKS) or copy. Returns which one"""
+    how = []
+    _replace_from_temp(dst, lambda tmp: how.append(_link_or_copy(src, tmp)))
+    return how[0]
+
+
+def file_sha256(p: Path) -> str:
+    h = hashlib.sha256()
+    with open(p, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def store_root(rec: DirRecord) -> Path:
+    if BACKUP_STORE == "library" and rec.library is not None:
+        return rec.library / BACKUP_STORE_DIR
+    return rec.path / BACKUP_STORE_DIR
+
+
+@dataclass
+class StoredBackup:
+    sha256: str
+    name: str  # name it would have had next to the cover (folder_backup.jpg / folder_backup_<time>.jpg)
+    size: int
+    created: float
+
+
+class BackupManifest:
+    """Stored backups of one folder's cover. The manifest records where its store is, relative to the folder"""
+
+    def __init__(self, rec: DirRecord):
+        self.rec = rec
+        self.path = rec.path / BACKUP_MANIFEST
+        self.store = store_root(rec)
+        self.backups: List[StoredBackup] = []
+        if rec.manifest is None:
+            return
+        try:
+            data = json.loads(rec.manifest.read_text(encoding="utf-8"))
+            self.store = Path(os.path.normpath(rec.path / data["store"]))
+            self.backups = [StoredBackup(**b) for b in data["backups"]]
+        except (ValueError, KeyError, TypeError) as e:
+            raise ValueError(f"Unreadable {rec.manifest.name}: {e}") from None
+
+    def object_path(self, b: StoredBackup) -> Path:
+        return self.store / "objects" / b.sha256[:2] / f"{b.sha256}.jpg"
+
+    @staticmethod
+    def stat(b: StoredBackup) -> Tuple[int, int]:
+        # Objects never change once written, so the creation time stands in for the mtime
+        return b.size, int(b.created * 1e9)
+
+    def add(self, src: Path, name: str) -> Tuple[StoredBackup, str]:
+        """List src as a backup, storing its content unless the store already has it"""
+        sha = file_sha256(src)
+        b = StoredBackup(sha, name, 0, time.time())
+        obj = self.object_path(b)
+        how = "already stored"
+        if not obj.exists():
+            obj.parent.mkdir(parents=True, exist_ok=True)
+            how = clone_file(src, obj)
+        b.size = obj.stat().st_size
+        self.backups.append(b)
+        self.save()
+        return b, how
+
+    def save(self):
+        data = {
+            "store": Path(os.path.relpath(self.store, self.rec.path)).as_posix(),
+            "backups": [asdict(b) for b in self.backups],
+        }
+        write_bytes_atomic(self.path, json.dumps(data, indent=1).encode("utf-8"))
+        self.rec.manifest = self.path
+        self.rec.stats[self.path.name] = _stat_key(self.path.stat())
 
 
 # ============================================================
 # Backup selection / creation
 # ============================================================
 
-def backup_candidates(d: Path) -> List[Path]:
-    pats = [d / f"{BACKUP_PREFIX}.jpg", *sorted(d.glob(f"{BACKUP_PREFIX}_*.jpg"))]
-    out = []
-    for p in pats:
-        if p.exists() and p.is_file():
-            out.append(p)
-    for p in sorted(d.glob(f"{BACKUP_PREFIX}*.jpg")):
-        if p.exists() and p.is_file() and p not in out:
-            out.append(p)
-    return out
+def backup_candidates(rec: DirRecord) -> List[Path]:
+    return list(rec.backups)
+
+
+@dataclass
+class BackupEntry:
+    path: Path
+    mtime: float
+    marked: bool
+    st: Optional[Tuple[int, int]] = None  # (size, mtime_ns) for the fingerprint cache
+    stored: Optional[StoredBackup] = None  # manifest entry for backups kept in the store
 
 
-def newest_clean_backup(d: Path) -> Optional[Path]:
-    cands = [p for p in backup_candidates(d) if not image_has_marker(p)]
-    cands.sort(key=lambda p: p.stat().st_mtime, reverse=True)
-    return cands[0] if cands else None
+class BackupInventory:
+    """
+    Backups of one directory, newest first, with their marker state.
+    Built once per folder and updated in place when a backup is created.
+    """
+
+    def __init__(self, rec: DirRecord):
+        self.rec = rec
+        entries = [
+            BackupEntry(p, rec.mtime(p), image_has_marker(p, rec.stats.get(p.name)), rec.stats.get(p.name))
+            for p in backup_candidates(rec)
+        ]
+        self.manifest = BackupManifest(rec) if rec.manifest is not None or BACKUP_STORE else None
+        if self.manifest is not None:
+            # Only clean covers are ever stored; objects removed from the store are ignored
+            for b in self.manifest.backups:
+                obj = self.manifest.object_path(b)
+                if obj.exists():
+                    entries.append(BackupEntry(obj, b.created, False, self.manifest.stat(b), b))
+        # Stable sort: equal mtimes keep the candidate order (primary first)
+        entries.sort(key=lambda e: e.mtime, reverse=True)
+        self.entries = entries
+
+    def newest_clean(self) -> Optional[Path]:
+        for e in self.entries:
+            if not e.marked:
+                return e.path
+        return None
+
+    def has(self, p: Path) -> bool:
+        return any(e.path == p for e in self.entries)
+
+    def stat(self, p: Path) -> Optional[Tuple[int, int]]:
+        for e in self.entries:
+            if e.path == p:
+                return e.st
+        return self.rec.stats.get(p.name)
+
+    def add(self, p: Path, stored: Optional[StoredBackup] = None):
+        rec = self.rec
+        if stored is None:
+            if p not in rec.backups:
+                rec.backups.append(p)
+            rec.stats[p.name] = _stat_key(p.stat())
+            entry = BackupEntry(p, rec.mtime(p), False, rec.stats[p.name])
+        else:
+            entry = BackupEntry(p, stored.created, False, BackupManifest.stat(stored), stored)
+        self.entries = [e for e in self.entries if e.path != p]
+        pos = 0
+        while pos < len(self.entries) and self.entries[pos].mtime >= entry.mtime:
+            pos += 1
+        self.entries.insert(pos, entry)
+
+
+def newest_clean_backup(rec: DirRecord) -> Optional[Path]:
+    return BackupInventory(rec).newest_clean()
 
 
 def timestamped_backup_name(d: Path) -> Path:
-    import datetime
     ts = datetime.datetime.now().strftime("%Y%m%d-%H%M%S")
     return d / f"{BACKUP_PREFIX}_{ts}.jpg"
 
 
-def create_new_clean_backup_from_current(d: Path, cover: Path) -> Optional[Path]:
-    if not cover.exists() or image_has_marker(cover):
+def _seed_backup_fingerprint(p: Path, st: Optional[Tuple[int, int]], fp: Optional[Fingerprint]):
+    # The backup is a byte copy of the cover we just fingerprinted, so store it without decoding
+    cache = fingerprint_cache() if fp is not None and st is not None else None
+    if cache is not None:
+        try:
+            cache.put(p, st, fp)
+        except sqlite3.Error:
+            pass
+
+
+def _store_clean_backup(inv: BackupInventory, cover: Path, fp: Optional[Fingerprint]) -> Path:
+    d = inv.rec.path
+    manifest = inv.manifest
+    primary = f"{BACKUP_PREFIX}.jpg"
+    original = not inv.has(d / primary) and all(b.name != primary for b in manifest.backups)
+    name = primary if original else timestamped_backup_name(d).name
+    stored, how = manifest.add(cover, name)
+    obj = manifest.object_path(stored)
+    inv.add(obj, stored)
+    _seed_backup_fingerprint(obj, BackupManifest.stat(stored), fp)
+    ok(f"[{d}] Backup ({'original' if original else 'new cover'}): {cover.name} -> {name} in store ({how})")
+    return obj
+
+
+def create_new_clean_backup_from_current(inv: BackupInventory, cover: Path, fp: Optional[Fingerprint] = None) -> Optional[Path]:
+    rec = inv.rec
+    d = rec.path
+    if image_has_marker(cover, rec.stats.get(cover.name)):
         return None
 
+    if inv.manifest is not None and BACKUP_STORE:
+        return _store_clean_backup(inv, cover, fp)
+
     primary = d / f"{BACKUP_PREFIX}.jpg"
-    if not primary.exists():
-        shutil.copy2(cover, primary)
+    if not inv.has(primary):
+        clone_file(cover, primary)
+        inv.add(primary)
+        _seed_backup_fingerprint(primary, rec.stats[primary.name], fp)
         ok(f"[{d}] Backup (original): {cover.name} -> {primary.name}")
         return primary
 
     p = timestamped_backup_name(d)
-    shutil.copy2(cover, p)
+    clone_file(cover, p)
+    inv.add(p)
+    _seed_backup_fingerprint(p, rec.stats[p.name], fp)
     ok(f"[{d}] Backup (new cover): {cover.name} -> {p.name}")
     return p
 
 
-def pick_base_cover_for_render(d: Path, cover: Path) -> Optional[Path]:
-    b = newest_clean_backup(d)
+def pick_base_cover_for_render(inv: BackupInventory, cover: Path) -> Optional[Path]:
+    b = inv.newest_clean()
     if b:
         return b
-    if cover.exists() and cover.is_file() and not image_has_marker(cover):
-        created = create_new_clean_backup_from_current(d, cover)
+    if not image_has_marker(cover, inv.rec.stats.get(cover.name)):
+        created = create_new_clean_backup_from_current(inv, cover)
         return created if created else cover
     return None
 
 
-def maybe_refresh_backup_if_cover_changed(d: Path, cover: Path) -> Optional[Path]:
-    if not cover.exists() or image_has_marker(cover):
+def maybe_refresh_backup_if_cover_changed(inv: BackupInventory, cover: Path) -> Optional[Path]:
+    rec = inv.rec
+    if image_has_marker(cover, rec.stats.get(cover.name)):
         return None
 
-    b = newest_clean_backup(d)
+    b = inv.newest_clean()
     if not b:
-        return create_new_clean_backup_from_current(d, cover)
+        return create_new_clean_backup_from_current(inv, cover)
 
-    if images_very_different(cover, b):
-        warn(f"[{d}] Detected major difference folder.jpg vs backup ({b.name}) → creating new backup.")
-        return create_new_clean_backup_from_current(d, cover)
+    # Only the live cover is decoded; the backup's fingerprint comes from the cache after the first run
+    fc = image_fingerprint(cover)
+    fb = cached_fingerprint(b, inv.stat(b))
+    if fc is not None and fb is not None and fingerprints_very_different(fc, fb):
+        warn(f"[{rec.path}] Detected major difference folder.jpg vs backup ({b.name}) → creating new backup.")
+        return create_new_clean_backup_from_current(inv, cover, fp=fc)
 
     return None
 
 
+# ============================================================
+# Backup pruning
+# ============================================================
+
+@dataclass
+class PrunePolicy:
+    keep_newest: int = 3           # clean backups kept per folder, newest first
+    keep_original: bool = True     # never remove folder_backup.jpg (the first clean cover that was seen)
+    drop_duplicates: bool = True   # byte-identical backups are kept once
+
+
+def format_size(n: int) -> str:
+    return f"{n / (1024 * 1024):.1f} MB"
+
+
+def _backup_label(e: BackupEntry) -> str:
+    return e.stored.name if e.stored is not None else e.path.name
+
+
+def _is_original_backup(e: BackupEntry) -> bool:
+    return os.path.normcase(_backup_label(e)) == os.path.normcase(f"{BACKUP_PREFIX}.jpg")
+
+
+def _backup_content_keys(entries: List[BackupEntry]) -> Dict[int, str]:
+    """SHA-256 per entry index. Files are hashed only when another backup has the same size"""
+    sizes: Dict[int, int] = {}
+    for e in entries:
+        if e.st:
+            sizes[e.st[0]] = sizes.get(e.st[0], 0) + 1
+    keys = {}
+    for i, e in enumerate(entries):
+        if e.stored is not None:
+            keys[i] = e.stored.sha256
+        elif e.st and sizes[e.st[0]] > 1:
+            keys[i] = file_sha256(e.path)
+    return keys
+
+
+def plan_prune(inv: BackupInventory, policy: PrunePolicy) -> List[Tuple[BackupEntry, str]]:
+    """Backups the policy drops, with the reason. Backups carrying the marker are left alone"""
+    clean = [e for e in inv.entries if not e.marked]
+    remove: List[Tuple[BackupEntry, str]] = []
+
+    if policy.drop_duplicates:
+        keys = _backup_content_keys(clean)
+        keeper: Dict[str, int] = {}
+        # Newest first, so the newest copy is kept unless the original is a copy too. The newest clean
+        # backup (clean[0]) is what the next burn renders from and is never dropped as a copy.
+        for i, e in enumerate(clean):
+            k = keys.get(i)
+            if k is None:
+                continue
+            j = keeper.get(k)
+            if j is None:
+                keeper[k] = i
+            elif _is_original_backup(e) and not _is_original_backup(clean[j]) and j > 0:
+                remove.append((clean[j], f"same as {_backup_label(e)}"))
+                keeper[k] = i
+            elif _is_original_backup(e) and policy.keep_original:
+                continue
+            else:
+                remove.append((e, f"same as {_backup_label(clean[j])}"))
+        dropped = {id(e) for e, _ in remove}
+        clean = [e for e in clean if id(e) not in dropped]
+
+    for e in clean[policy.keep_newest:]:
+        if policy.keep_original and _is_original_backup(e):
+            continue
+        remove.append((e, f"older than the newest {policy.keep_newest}"))
+    return remove
+
+
+def prune_dir(rec: DirRecord, policy: PrunePolicy, dry_run: bool, refs: Dict[Path, set]) -> Tuple[int, int, int]:
+    """
+    Remove (dry_run: only report) the backups the policy drops. Returns backups dropped, files and bytes
+    freed in the folder; stored backups are only unlisted here, their objects go in collect_store_garbage().
+    refs collects the objects each store still needs.
+    """
+    if not rec.backups and rec.manifest is None:
+        return 0, 0, 0
+    inv = BackupInventory(rec)
+    verb = "Would remove" if dry_run else "Removed"
+    files = size = 0
+    unlisted = set()
+    remove = plan_prune(inv, policy)
+    for e, reason in remove:
+        if e.stored is not None:
+            unlisted.add(id(e.stored))
+        else:
+            if not dry_run:
+                e.path.unlink()
+            files += 1
+            size += e.st[0] if e.st else 0
+        info(f"[{rec.path}] {verb} {_backup_label(e)} ({reason})")
+
+    m = inv.manifest
+    if m is not None and rec.manifest is not None:
+        # Entries whose object is gone from the store are not in the inventory and are dropped as well
+        listed = {id(e.stored) for e in inv.entries if e.stored is not None}
+        live = [b for b in m.backups if id(b) in listed and id(b) not in unlisted]
+        if not dry_run and len(live) != len(m.backups):
+            m.backups = live
+            if live:
+                m.save()
+            else:
+                m.path.unlink()
+                rec.stats.pop(m.path.name, None)
+                rec.manifest = None
+        refs.setdefault(m.store, set()).update(b.sha256 for b in live)
+    return len(remove), files, size
+
+
+def collect_store_garbage(refs: Dict[Path, set], root: Path, dry_run: bool) -> Tuple[int, int]:
+    """
+    Delete store objects no manifest refers to any more. Only stores inside the walked tree are
+    collected: manifests outside it may still use objects of a store above `root`.
+    """
+    files = size = 0
+    for store, live in refs.items():
+        if store.parent != root and root not in store.parents:
+            warn(f"{store} is outside {root}: its unused objects were not collected.")
+            continue
+        objects = store / "objects"
+        if not objects.is_dir():
+            continue
+        for sub in objects.iterdir():
+            for obj in sub.glob("*.jpg"):
+                if obj.stem in live:
+                    continue
+                files += 1
+                size += obj.stat().st_size
+                if not dry_run:
+                    obj.unlink()
+            if not dry_run:
+                try:
+                    sub.rmdir()
+                except OSError:
+                    pass  # still has objects
+    return files, size
+
+
+def run_prune(records: Iterable[DirRecord], policy: PrunePolicy, root: Path, recursive: bool,
+              dry_run: bool = True) -> Dict[str, int]:
+    counts = {"checked": 0, "pruned": 0, "backups": 0, "files": 0, "bytes": 0, "error": 0}
+    refs: Dict[Path, set] = {}
+    for rec in records:
+        counts["checked"] += 1
+        try:
+            removed, files, size = prune_dir(rec, policy, dry_run, refs)
+        except Exception as e:
+            err(f"[{rec.path}] Prune error: {e}")
+            counts["error"] += 1
+            continue
+        if removed:
+            counts["pruned"] += 1
+        counts["backups"] += removed
+        counts["files"] += files
+        counts["bytes"] += size
+
+    if not refs:
+        return counts
+    if not recursive:
+        info("Store objects are only collected on recursive runs (other folders may still use them).")
+    elif counts["error"]:
+        warn("Store objects were not collected because some folders could not be read.")
+    else:
+        files, size = collect_store_garbage(refs, root, dry_run)
+        counts["files"] += files
+        counts["bytes"] += size
+    return counts
+
+
 # ============================================================
 # Cover open/save
 # ============================================================
 
-def open_fit_cover(path: Path) -> Image.Image:
-    img = Image.open(path).convert("RGB")
+def open_fit_cover(path: Union[Path, BinaryIO]) -> Image.Image:
+    img = open_image_for_size(path, TARGET_SIZE, oversample=DRAFT_OVERSAMPLE)
     img = ImageOps.fit(img, TARGET_SIZE, method=Image.Resampling.LANCZOS, centering=(0.5, 0.5))
     return img
 
 
-def save_cover_with_marker(img_rgb: Image.Image, cover: Path, marker_extra: str = ""):
+def encode_cover_with_marker(img_rgb: Image.Image, marker_extra: str = "") -> bytes:
     exif = img_rgb.getexif()
     exif = exif_set_marker(exif, marker_extra)
+    buf = io.BytesIO()
     img_rgb.save(
-        cover,
+        buf,
         format="JPEG",
-        quality=95,
-        subsampling=0,
+        quality=JPEG_QUALITY,
+        subsampling=JPEG_SUBSAMPLING,
         dpi=TARGET_DPI,
         optimize=True,
         exif=exif.tobytes()
     )
+    return buf.getvalue()
+
+
+def save_cover_with_marker(img_rgb: Image.Image, cover: Path, marker_extra: str = ""):
+    write_bytes_atomic(cover, encode_cover_with_marker(img_rgb, marker_extra))
 
 
 # ============================================================
 # Processing
 # ============================================================
 
-def process_dir(d: Path, cfg: Dict, preferred_field: str) -> bool:
-    cover = d / COVER_NAME
-    if not cover.exists() or not cover.is_file():
+def cover_is_current(inv: BackupInventory, cover: Path, used_field: str, rating_text: str, cfg_key: str) -> bool:
+    """True when folder.jpg already carries this rating, drawn with this config from the current base"""
+    payload = read_marker(cover, inv.rec.stats.get(cover.name))
+    if payload is None:
+        return False
+    base = inv.newest_clean()
+    if base is None:
         return False
+    return parse_marker_payload(payload) == parse_marker_payload(
+        build_marker_payload(used_field, rating_text, cfg_key, base.name)
+    )
+
 
-    found = find_any_nfo_with_rating(d, preferred_field=preferred_field)
+@dataclass
+class RenderJob:
+    """One cover to draw, handed from stage to stage: plan -> load -> render -> write"""
+    rec: DirRecord
+    cover: Path
+    base: Path
+    rating_text: str
+    marker_extra: str
+    img: Optional[Image.Image] = None  # fitted base, set by load_job
+    out: Optional[bytes] = None        # encoded cover, set by render_job
+
+
+def plan_dir(rec: DirRecord, cfg: Dict, preferred_field: str) -> Tuple[str, Optional[RenderJob]]:
+    """NFO lookup and backup bookkeeping. Returns ("render", job) or a final status and no job"""
+    d = rec.path
+    cover = rec.cover
+    if cover is None:
+        return "skipped", None
+
+    with stage("nfo"):
+        found = find_rating(rec, preferred_field)
     if not found:
-        return False
+        return "skipped", None
 
     nfo_path, rating, used_field, used_fallback = found
     rating_text = format_1_decimal(rating)  # Proper rounding
+    cfg_key = cfg_fingerprint(cfg)
 
-    maybe_refresh_backup_if_cover_changed(d, cover)
+    with stage("backups"):
+        inv = BackupInventory(rec)
+    with stage("marker"):
+        current = cover_is_current(inv, cover, used_field, rating_text, cfg_key)
+    if current:
+        return "current", None
 
-    base = pick_base_cover_for_render(d, cover)
+    with stage("change_check"):
+        maybe_refresh_backup_if_cover_changed(inv, cover)
+
+    with stage("backups"):
+        base = pick_base_cover_for_render(inv, cover)
     if base is None:
         warn(f"[{d}] No clean cover for generation (folder.jpg has marker, no clean backup available).")
         warn("Skipping to avoid overlaying rating on rating.")
-        return False
+        return "skipped", None
 
     info(f"[{d}] Source: {nfo_path.name} | preferred: <{preferred_field}>")
     if used_fallback:
-        warn(f"[{d}] No <{preferred_field}> in NFO → used <{used_field}> as fallback.")
+        where = "NFO" if nfo_path.suffix.lower() == ".nfo" else nfo_path.name
+        warn(f"[{d}] No <{preferred_field}> in {where} → used <{used_field}> as fallback.")
     info(f"[{d}] Rating: {rating} -> {rating_text} | Base: {base.name}")
 
-    img = open_fit_cover(base)
-    img = draw_badge_bottom_right(img, rating_text, cfg)
-    save_cover_with_marker(img, cover, marker_extra=f"field={used_field};rating={rating_text}")
-    ok(f"[{d}] Saved: {cover.name}")
-    return True
+    marker_extra = build_marker_payload(used_field, rating_text, cfg_key, base.name)
+    return "render", RenderJob(rec, cover, base, rating_text, marker_extra)
 
 
-def restore_cover(d: Path) -> bool:
-    cover = d / COVER_NAME
-    if not cover.exists():
+def load_job(job: RenderJob):
+    # Read the whole file first so the decode never waits on the network
+    with stage("read"):
+        data = job.base.read_bytes()
+    try:
+        with stage("decode"):
+            job.img = open_fit_cover(io.BytesIO(data))
+    except Image.UnidentifiedImageError:
+        raise Image.UnidentifiedImageError(f"cannot identify image file {str(job.base)!r}") from None
+
+
+def render_job(job: RenderJob, cfg: Dict):
+    with stage("render"):
+        img = draw_badge_bottom_right(job.img, job.rating_text, cfg)
+    with stage("encode"):
+        job.out = encode_cover_with_marker(img, job.marker_extra)
+    job.img = None
+
+
+def write_job(job: RenderJob):
+    with stage("write"):
+        write_bytes_atomic(job.cover, job.out)
+    job.out = None
+    job.rec.stats[job.cover.name] = _stat_key(job.cover.stat())
+    ok(f"[{job.rec.path}] Saved: {job.cover.name}")
+
+
+def process_dir(rec: DirRecord, cfg: Dict, preferred_field: str) -> str:
+    """Returns "processed", "current" (cover already up to date) or "skipped" """
+    status, job = plan_dir(rec, cfg, preferred_field)
+    if job is None:
+        return status
+    load_job(job)
+    render_job(job, cfg)
+    write_job(job)
+    return "processed"
+
+
+def restore_cover(rec: DirRecord) -> bool:
+    cover = rec.cover
+    if cover is None:
         return False
-    b = newest_clean_backup(d)
+    with stage("lookup"):
+        b = newest_clean_backup(rec)
     if not b:
         return False
-    shutil.copy2(b, cover)
-    ok(f"[{d}] Restored {cover.name} from {b.name}")
+    with stage("copy"):
+        clone_file(b, cover)
+    ok(f"[{rec.path}] Restored {cover.name} from {b.name}")
     return True
 
 
-def iter_target_dirs(root: Path, recursive: bool):
-    if recursive:
-        yield root
-        for p in root.rglob("*"):
-            if p.is_dir():
-                yield p
+# ============================================================
+# Incremental state index (skip folders whose inputs did not change)
+# ============================================================
+
+def cfg_fingerprint(cfg: Dict) -> str:
+    """Short stable hash of the effective render config, including the output settings at the top"""
+    output = [TARGET_SIZE, TARGET_DPI, JPEG_QUALITY, JPEG_SUBSAMPLING, DRAFT_DECODE, DRAFT_OVERSAMPLE]
+    payload = json.dumps([EXIF_MARKER, sorted(cfg.items()), output], default=list)
+    return hashlib.sha1(payload.encode("utf-8")).hexdigest()[:12]
+
+
+def dir_signature(rec: DirRecord, cfg_key: str, preferred_field: str) -> str:
+    """Hash of everything process_dir() reads: cover, NFOs, backups (size + mtime), ratings, field and config"""
+    parts = [cfg_key, preferred_field, sorted(rec.stats.items())]
+    if _RATING_SOURCES:
+        parts.append([source.signature(rec) for source in _RATING_SOURCES])
+    payload = json.dumps(parts)
+    return hashlib.sha1(payload.encode("utf-8")).hexdigest()
+
+
+class StateIndex:
+    """Per-directory input signatures from previous runs (SQLite in the user cache dir)"""
+
+    COMMIT_EVERY = 200
+
+    def __init__(self, path: Optional[Path] = None):
+        self.path = path or (cache_dir() / STATE_DB_NAME)
+        # The pipeline engine reads it from its walker thread; BurnTally serializes access
+        self.db = sqlite3.connect(str(self.path), check_same_thread=False)
+        self.db.execute(
+            "CREATE TABLE IF NOT EXISTS dirs ("
+            " path TEXT PRIMARY KEY, signature TEXT NOT NULL, field TEXT, cfg TEXT, status TEXT, updated REAL)"
+        )
+        self._dirty = 0
+
+    @staticmethod
+    def _key(d: Path) -> str:
+        return os.path.normcase(os.path.abspath(d))
+
+    def get(self, d: Path) -> Optional[str]:
+        row = self.db.execute("SELECT signature FROM dirs WHERE path = ?", (self._key(d),)).fetchone()
+        return row[0] if row else None
+
+    def put(self, d: Path, signature: str, preferred_field: str, cfg_key: str, status: str):
+        self.db.execute(
+            "INSERT OR REPLACE INTO dirs (path, signature, field, cfg, status, updated) VALUES (?, ?, ?, ?, ?, ?)",
+            (self._key(d), signature, preferred_field, cfg_key, status, time.time()),
+        )
+        self._dirty += 1
+        if self._dirty >= self.COMMIT_EVERY:
+            self.commit()
+
+    def forget(self, d: Path):
+        self.db.execute("DELETE FROM dirs WHERE path = ?", (self._key(d),))
+        self._dirty += 1
+
+    def commit(self):
+        self.db.commit()
+        self._dirty = 0
+
+    def close(self):
+        self.commit()
+        self.db.close()
+
+
+# ============================================================
+# Burn engine (sequential, process pool or threaded pipeline)
+# ============================================================
+
+@dataclass
+class DirResult:
+    path: Path
+    status: str  # "processed" | "current" | "skipped" | "no_cover" | "unchanged" | "error" (restore: "restored" | "no_backup")
+    lines: List[str] = field(default_factory=list)
+    signature: Optional[str] = None  # inputs after processing, for the state index
+    timings: Dict[str, float] = field(default_factory=dict)  # stage -> seconds, when timing is on
+
+    def to_dict(self) -> Dict:
+        return {"path": str(self.path), "status": self.status, "lines": [_ANSI_RE.sub("", l) for l in self.lines],
+                "timings": self.timings}
+
+
+def burn_dir(rec: DirRecord, cfg: Dict, preferred_field: str, track_state: bool = False,
+             timing: bool = False) -> DirResult:
+    """Process one directory with console output captured (safe to run in a worker process)"""
+    signature = None
+    t = time.perf_counter()
+    with captured_output() as lines, timed_stages(enabled=timing) as timings:
+        if rec.cover is None:
+            status = "no_cover"
+        else:
+            try:
+                status = process_dir(rec, cfg, preferred_field=preferred_field)
+                if track_state:
+                    refresh_stats(rec)
+                    signature = dir_signature(rec, cfg_fingerprint(cfg), preferred_field)
+            except Exception as e:
+                err(f"[{rec.path}] Error: {e}")
+                status = "error"
+    if timing and rec.cover is not None:
+        timings["total"] = time.perf_counter() - t
+    return DirResult(rec.path, status, lines, signature, timings or {})
+
+
+def _init_burn_worker(cfg: Dict, sources: Optional[List[RatingSource]] = None):
+    badge_atlas(cfg).prebuild()
+    _RATING_SOURCES[:] = sources or []
+
+
+def worker_processes_supported() -> bool:
+    """
+    Whether worker processes can load this module. Forked workers inherit it; spawned ones (Windows,
+    macOS) import it again by name, which fails for a copy loaded from a file path under a made-up name.
+    """
+    import multiprocessing
+    import importlib.machinery
+    method = multiprocessing.get_start_method(allow_none=True) or multiprocessing.get_all_start_methods()[0]
+    if method == "fork" or __name__ == "__main__" or "." in __name__:
+        return True
+    spec = importlib.machinery.PathFinder.find_spec(__name__)
+    return spec is not None and spec.origin is not None and os.path.samefile(spec.origin, __file__)
+
+
+class BurnTally:
+    """Counts, console output and state index updates for one run (safe to call from several threads)"""
+
+    def __init__(self, cfg: Dict, preferred_field: str, index: Optional[StateIndex] = None,
+                 stats: Optional[RunStats] = None, progress: Optional[ProgressLine] = None,
+                 log: Optional[RunLog] = None, results: Optional[List[DirResult]] = None, echo: bool = True):
+        self.counts = {"checked": 0, "processed": 0, "current": 0, "skipped": 0, "no_cover": 0, "unchanged": 0,
+                       "error": 0}
+        self.cfg_key = cfg_fingerprint(cfg)
+        self.preferred_field = preferred_field
+        self.index = index
+        self.stats = stats
+        self.progress = progress
+        self.log = log
+        self.results = results
+        self.echo = echo
+        self._lock = threading.Lock()
+
+    def collect(self, res: DirResult):
+        with self._lock:
+            self.counts["checked"] += 1
+            self.counts[res.status] += 1
+            if self.stats is not None:
+                self.stats.add(res.path, res.timings)
+            if self.log is not None:
+                self.log.write(res.path, res.status, res.lines, res.timings)
+            if self.results is not None:
+                self.results.append(res)
+            if self.progress is None:
+                if self.echo:
+                    for line in res.lines:
+                        print(line)
+            else:
+                # Only errors make it to the console; everything else is in the log
+                if res.status == "error":
+                    self.progress.clear()
+                    for line in res.lines:
+                        print(line)
+                self.progress.update(self.counts["checked"], self.counts["error"])
+            if self.index is not None:
+                if res.signature:
+                    self.index.put(res.path, res.signature, self.preferred_field, self.cfg_key, res.status)
+                elif res.status == "error":
+                    self.index.forget(res.path)
+
+    def changed(self, rec: DirRecord) -> bool:
+        if self.index is None or rec.cover is None:
+            return True
+        with self._lock:
+            known = self.index.get(rec.path)
+        if known != dir_signature(rec, self.cfg_key, self.preferred_field):
+            return True
+        self.collect(DirResult(rec.path, "unchanged"))
+        return False
+
+
+def run_burn(records: Iterable[DirRecord], cfg: Dict, preferred_field: str, workers: int = 1,
+             index: Optional[StateIndex] = None, engine: str = "processes",
+             stats: Optional[RunStats] = None, progress: Optional[ProgressLine] = None,
+             log: Optional[RunLog] = None, sources: Optional[List[RatingSource]] = None,
+             results: Optional[List[DirResult]] = None, echo: bool = True,
+             pool: Optional[futures.ProcessPoolExecutor] = None) -> Dict[str, int]:
+    """
+    engine: "processes" (workers = pool size) or "pipeline" (workers = threads per I/O stage).
+    sources: rating sources tried before the NFOs (JellyfinRatings, ImdbRatings).
+    results: collects the DirResult of every folder; echo=False keeps their lines off the console.
+    pool: a pool started with _init_burn_worker(cfg, sources) to reuse instead of starting one.
+    """
+    # The state index signatures of this process need the sources as well
+    _RATING_SOURCES[:] = sources or []
+    tally = BurnTally(cfg, preferred_field, index, stats, progress, log, results, echo)
+    counts = tally.counts
+    collect = tally.collect
+    changed = tally.changed
+    track_state = index is not None
+    timing = stats is not None
+
+    try:
+        if engine == "pipeline":
+            run_pipeline(records, cfg, preferred_field, tally, io_threads=workers)
+            return counts
+
+        if workers <= 1:
+            _init_burn_worker(cfg, sources)
+            for rec in records:
+                if changed(rec):
+                    collect(burn_dir(rec, cfg, preferred_field, track_state, timing))
+            return counts
+
+        # Keep a bounded number of folders in flight so the walker is never far ahead of the pool
+        max_pending = workers * 4
+        pending = set()
+        if pool is None:
+            pool_ctx = futures.ProcessPoolExecutor(max_workers=workers, initializer=_init_burn_worker,
+                                                   initargs=(cfg, sources))
+        else:
+            pool_ctx = nullcontext(pool)
+        with pool_ctx as pool:
+            for rec in records:
+                if not changed(rec):
+                    continue
+                pending.add(pool.submit(burn_dir, rec, cfg, preferred_field, track_state, timing))
+                if len(pending) >= max_pending:
+                    done, pending = futures.wait(pending, return_when=futures.FIRST_COMPLETED)
+                    for fut in done:
+                        collect(fut.result())
+            for fut in pending:
+                collect(fut.result())
+        return counts
+    finally:
+        if stats is not None:
+            stats.finish()
+        if index is not None:
+            index.commit()
+
+
+# ============================================================
+# Threaded pipeline: walk -> NFO -> read/decode -> render/encode -> write
+# ============================================================
+
+_STOP = object()
+
+
+@dataclass
+class PipelineItem:
+    rec: DirRecord
+    lines: List[str] = field(default_factory=list)
+    job: Optional[RenderJob] = None
+    status: str = "error"
+    signature: Optional[str] = None
+    timings: Dict[str, float] = field(default_factory=dict)
+
+
+class PipelineStage:
+    """Threads taking items from `inbox`; when the last one sees the end marker it passes `downstream` markers on"""
+
+    def __init__(self, name: str, work: Callable[[PipelineItem], bool], threads: int,
+                 inbox: "queue.Queue", outbox: "queue.Queue", downstream: int):
+        self.work = work
+        self.inbox = inbox
+        self.outbox = outbox
+        self.downstream = downstream
+        self._left = threads
+        self._lock = threading.Lock()
+        self.threads = [threading.Thread(target=self._run, name=f"{name}-{i}", daemon=True) for i in range(threads)]
+
+    def start(self):
+        for t in self.threads:
+            t.start()
+
+    def _run(self):
+        while True:
+            item = self.inbox.get()
+            if item is _STOP:
+                break
+            if self.work(item):
+                self.outbox.put(item)
+        with self._lock:
+            self._left -= 1
+            last = self._left == 0
+        if last:
+            for _ in range(self.downstream):
+                self.outbox.put(_STOP)
+
+
+def run_pipeline(records: Iterable[DirRecord], cfg: Dict, preferred_field: str, tally: BurnTally,
+                 io_threads: int = PIPELINE_IO_THREADS):
+    """
+    Stages run concurrently with bounded queues between them, so reads and writes on a
+    slow share overlap with drawing. Pillow releases the GIL while decoding and encoding.
+    """
+    track_state = tally.index is not None
+    timing = tally.stats is not None
+    cpu_threads = default_workers()
+    depth = max(io_threads, cpu_threads) * PIPELINE_QUEUE_DEPTH
+    to_plan, to_load, to_render, to_write = (queue.Queue(depth) for _ in range(4))
+    done: "queue.Queue" = queue.Queue()
+
+    def finish(item: PipelineItem, status: str):
+        if track_state:
+            refresh_stats(item.rec)
+            item.signature = dir_signature(item.rec, tally.cfg_key, preferred_field)
+        item.status = status
+        item.job = None
+        done.put(item)
+
+    def step(fn: Callable[[PipelineItem], Optional[str]]) -> Callable[[PipelineItem], bool]:
+        """fn returns None to pass the item to the next stage, or its final status"""
+        def work(item: PipelineItem) -> bool:
+            with captured_output(item.lines), timed_stages(item.timings, enabled=timing):
+                try:
+                    status = fn(item)
+                    if status is None:
+                        return True
+                    finish(item, status)
+                except Exception as e:
+                    err(f"[{item.rec.path}] Error: {e}")
+                    item.status = "error"
+                    item.job = None
+                    done.put(item)
+            return False
+        return work
+
+    def plan(item: PipelineItem) -> Optional[str]:
+        status, item.job = plan_dir(item.rec, cfg, preferred_field)
+        return None if item.job is not None else status
+
+    def load(item: PipelineItem) -> Optional[str]:
+        load_job(item.job)
+        return None
+
+    def render(item: PipelineItem) -> Optional[str]:
+        render_job(item.job, cfg)
+        return None
+
+    def write(item: PipelineItem) -> Optional[str]:
+        write_job(item.job)
+        return "processed"
+
+    stages = [
+        PipelineStage("nfo", step(plan), io_threads, to_plan, to_load, io_threads),
+        PipelineStage("load", step(load), io_threads, to_load, to_render, cpu_threads),
+        PipelineStage("render", step(render), cpu_threads, to_render, to_write, io_threads),
+        PipelineStage("write", step(write), io_threads, to_write, done, 1),
+    ]
+
+    walk_errors: List[BaseException] = []
+
+    def walk():
+        try:
+            for rec in records:
+                if not tally.changed(rec):
+                    continue
+                if rec.cover is None:
+                    done.put(PipelineItem(rec, status="no_cover"))
+                else:
+                    to_plan.put(PipelineItem(rec))
+        except BaseException as e:
+            walk_errors.append(e)
+        finally:
+            for _ in range(io_threads):
+                to_plan.put(_STOP)
+
+    _init_burn_worker(cfg, list(_RATING_SOURCES))
+    for stage in stages:
+        stage.start()
+    walker = threading.Thread(target=walk, name="walk", daemon=True)
+    walker.start()
+
+    while True:
+        item = done.get()
+        if item is _STOP:
+            break
+        tally.collect(DirResult(item.rec.path, item.status, item.lines, item.signature, item.timings))
+
+    walker.join()
+    if walk_errors:
+        raise walk_errors[0]
+
+
+# ============================================================
+# Watch mode (inotify on Linux, polling elsewhere)
+# ============================================================
+
+_IN_CLOSE_WRITE = 0x00000008
+_IN_MOVED_FROM = 0x00000040
+_IN_MOVED_TO = 0x00000080
+_IN_CREATE = 0x00000100
+_IN_DELETE = 0x00000200
+_IN_DELETE_SELF = 0x00000400
+_IN_Q_OVERFLOW = 0x00004000
+_IN_IGNORED = 0x00008000
+_IN_ISDIR = 0x40000000
+_IN_WATCH_MASK = _IN_CLOSE_WRITE | _IN_MOVED_FROM | _IN_MOVED_TO | _IN_CREATE | _IN_DELETE | _IN_DELETE_SELF
+_IN_EVENT = struct.Struct("iIII")  # wd, mask, cookie, name length
+
+
+def _watch_relevant(name: str) -> bool:
+    """Files that can change the burned cover (backups, manifests and temp files cannot)"""
+    key = os.path.normcase(name)
+    return key == os.path.normcase(COVER_NAME) or key.endswith(".nfo")
+
+
+def _subdirs(d: Path) -> List[Path]:
+    try:
+        return _list_dir(d)[1]
+    except OSError:
+        return []
+
+
+class InotifyWatcher:
+    """Changed folders under a tree through Linux inotify (one watch per folder, ctypes only)"""
+
+    def __init__(self, root: Path, recursive: bool = True):
+        libc = ctypes.CDLL(None, use_errno=True)
+        self._add_watch = libc.inotify_add_watch
+        self._add_watch.argtypes = [ctypes.c_int, ctypes.c_char_p, ctypes.c_uint32]
+        self._rm_watch = libc.inotify_rm_watch
+        self.fd = libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+        self.recursive = recursive
+        self.dirs: Dict[int, Path] = {}
+        self.overflowed = False
+        self.add_tree(root)
+
+    @staticmethod
+    def available() -> bool:
+        if not sys.platform.startswith("linux"):
+            return False
+        try:
+            return hasattr(ctypes.CDLL(None), "inotify_init1")
+        except OSError:
+            return False
+
+    def add_tree(self, top: Path) -> List[Path]:
+        """Watch top (and the folders below it); returns the folders now watched"""
+        added = []
+        stack = [top]
+        while stack:
+            d = stack.pop()
+            wd = self._add_watch(self.fd, os.fsencode(str(d)), _IN_WATCH_MASK)
+            if wd < 0:
+                e = ctypes.get_errno()
+                if e == errno.ENOSPC:
+                    raise OSError(e, "inotify watch limit reached (raise fs.inotify.max_user_watches)")
+                continue
+            if wd in self.dirs:
+                continue  # same folder already watched (reached again through a symlink)
+            self.dirs[wd] = d
+            added.append(d)
+            if self.recursive:
+                stack.extend(_subdirs(d))
+        return added
+
+    def _drop_tree(self, top: Path):
+        for wd, d in list(self.dirs.items()):
+            if d == top or top in d.parents:
+                self._rm_watch(self.fd, wd)
+                del self.dirs[wd]
+
+    def read(self, timeout: float) -> List[Path]:
+        """Folders with relevant changes; a changed tvshow.nfo also marks the show's season folders"""
+        ready, _, _ = select.select([self.fd], [], [], timeout)
+        if not ready:
+            return []
+        try:
+            data = os.read(self.fd, 64 * 1024)
+        except BlockingIOError:
+            return []
+        changed = []
+        off = 0
+        while off + _IN_EVENT.size <= len(data):
+            wd, mask, _, length = _IN_EVENT.unpack_from(data, off)
+            name = os.fsdecode(data[off + _IN_EVENT.size:off + _IN_EVENT.size + length].rstrip(b"\0"))
+            off += _IN_EVENT.size + length
+            if mask & _IN_Q_OVERFLOW:
+                self.overflowed = True
+                continue
+            d = self.dirs.get(wd)
+            if d is None:
+                continue
+            if mask & _IN_IGNORED:
+                del self.dirs[wd]
+                continue
+            if mask & _IN_ISDIR:
+                if name == BACKUP_STORE_DIR or not self.recursive:
+                    continue
+                if mask & (_IN_CREATE | _IN_MOVED_TO):
+                    changed.extend(self.add_tree(d / name))
+                elif mask & _IN_MOVED_FROM:
+                    self._drop_tree(d / name)
+                continue
+            if not _watch_relevant(name):
+                continue
+            changed.append(d)
+            if os.path.normcase(name) == os.path.normcase(SHOW_NFO):
+                changed.extend(_subdirs(d))
+        return changed
+
+    def close(self):
+        os.close(self.fd)
+
+
+class PollingWatcher:
+    """Fallback without inotify: compares the folder listings every WATCH_POLL_INTERVAL seconds"""
+
+    overflowed = False
+
+    def __init__(self, root: Path, recursive: bool = True, interval: float = WATCH_POLL_INTERVAL):
+        self.root = root
+        self.recursive = recursive
+        self.interval = interval
+        self.seen = self._snapshot()
+        self.next_poll = time.monotonic() + interval
+
+    def _snapshot(self) -> Dict[Path, List]:
+        return {rec.path: sorted(rec.stats.items()) for rec in iter_dir_records(self.root, self.recursive)}
+
+    def read(self, timeout: float) -> List[Path]:
+        wait_s = self.next_poll - time.monotonic()
+        if wait_s > timeout:
+            time.sleep(timeout)
+            return []
+        time.sleep(max(wait_s, 0.0))
+        seen = self._snapshot()
+        changed = [d for d, st in seen.items() if self.seen.get(d) != st]
+        self.seen = seen
+        self.next_poll = time.monotonic() + self.interval
+        return changed
+
+    def close(self):
+        pass
+
+
+class DirQueue:
+    """Folders waiting to be re-burned, each once: queueing it again only pushes its due time back"""
+
+    def __init__(self, delay: float = WATCH_DEBOUNCE):
+        self.delay = delay
+        self._due: Dict[Path, float] = {}
+        self._cond = threading.Condition()
+
+    def __len__(self) -> int:
+        with self._cond:
+            return len(self._due)
+
+    def put(self, d: Path) -> bool:
+        """True when d was not queued yet"""
+        with self._cond:
+            new = d not in self._due
+            self._due[d] = time.monotonic() + self.delay
+            self._cond.notify()
+            return new
+
+    def next_wait(self, idle: float = 1.0) -> float:
+        """Seconds until the next folder is due (idle when nothing is queued)"""
+        with self._cond:
+            if not self._due:
+                return idle
+            return max(0.0, min(self._due.values()) - time.monotonic())
+
+    def take_ready(self, timeout: float = 0.0) -> List[Path]:
+        """Folders that are due, waiting up to timeout for the first one"""
+        end = time.monotonic() + timeout
+        with self._cond:
+            while True:
+                now = time.monotonic()
+                ready = sorted(d for d, t in self._due.items() if t <= now)
+                if ready or now >= end:
+                    for d in ready:
+                        del self._due[d]
+                    return ready
+                self._cond.wait(min(end, min(self._due.values(), default=end)) - now)
+
+
+def _reburn(d: Path, root: Path, cfg: Dict, preferred_field: str, tally: BurnTally):
+    rec = scan_dir(d, library=root)
+    if rec.cover is not None and tally.changed(rec):
+        tally.collect(burn_dir(rec, cfg, preferred_field, track_state=True))
+
+
+def watch_library(root: Path, cfg: Dict, preferred_field: str, index: StateIndex, recursive: bool = True,
+                  sources: Optional[List[RatingSource]] = None, debounce: float = WATCH_DEBOUNCE,
+                  stop: Optional[threading.Event] = None) -> Dict[str, int]:
+    """
+    Re-burn folders whose cover or NFOs change, until stop is set or Ctrl+C.
+    A folder is handled once it has been quiet for `debounce` seconds. Our own writes are
+    skipped by the state index: the signature stored after processing already includes them.
+    """
+    _RATING_SOURCES[:] = sources or []
+    _init_burn_worker(cfg, sources)
+    tally = BurnTally(cfg, preferred_field, index)
+    if InotifyWatcher.available():
+        watcher = InotifyWatcher(root, recursive)
+        info(f"Watching {len(watcher.dirs)} folders for changes (inotify).")
     else:
-        yield root
+        watcher = PollingWatcher(root, recursive)
+        info(f"Checking for changes every {WATCH_POLL_INTERVAL:g} s (inotify not available).")
+
+    pending = DirQueue(debounce)
+    try:
+        while stop is None or not stop.is_set():
+            for d in watcher.read(max(pending.next_wait(), 0.05)):
+                pending.put(d)
+            if watcher.overflowed:
+                watcher.overflowed = False
+                warn("Too many changes at once: checking every folder.")
+                for rec in iter_dir_records(root, recursive):
+                    pending.put(rec.path)
+
+            ready = pending.take_ready()
+            for d in ready:
+                _reburn(d, root, cfg, preferred_field, tally)
+            if ready:
+                index.commit()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        watcher.close()
+        index.commit()
+    return tally.counts
+
+
+# ============================================================
+# Webhook listener (Jellyfin Webhook plugin)
+# ============================================================
+
+_WEBHOOK_PATH_KEYS = {"path", "itempath", "folderpath", "paths"}
+
+
+def webhook_paths(payload) -> List[str]:
+    """Item paths anywhere in a payload: "Path" / "ItemPath" / "Paths": [...], nested or batched in a list"""
+    found = []
+    stack = [payload]
+    while stack:
+        v = stack.pop()
+        if isinstance(v, list):
+            stack.extend(reversed(v))
+        elif isinstance(v, dict):
+            for k, x in v.items():
+                if isinstance(k, str) and k.lower() in _WEBHOOK_PATH_KEYS:
+                    if isinstance(x, str) and x:
+                        found.append(x)
+                    elif isinstance(x, list):
+                        found.extend(p for p in x if isinstance(p, str) and p)
+                elif isinstance(x, (dict, list)):
+                    stack.append(x)
+    return found
+
+
+def webhook_dirs(item_path: str, root: Path, path_map: List[Tuple[str, str]]) -> List[Path]:
+    """Folders to re-burn for an item path under root: its folder, plus the season folders of a show"""
+    p = Path(map_jellyfin_path(item_path, path_map))
+    if not p.is_dir():
+        p = p.parent  # movie / episode file
+    key, root_key = _path_key(str(p)), _path_key(str(root))
+    if key != root_key and not key.startswith(root_key.rstrip(os.sep) + os.sep):
+        return []
+    dirs = [p]
+    if (p / SHOW_NFO).is_file():
+        dirs.extend(_subdirs(p))
+    return dirs
+
+
+def make_webhook_server(address: Tuple[str, int], root: Path, pending: DirQueue,
+                        path_map: Optional[List[Tuple[str, str]]] = None, token: Optional[str] = None):
+    """
+    ThreadingHTTPServer that takes item paths and queues their folders (deduplicated) for the burn loop.
+    http.server is only imported here, when listening.
+    """
+    import hmac
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+    from urllib.parse import urlsplit, parse_qs
+
+    class WebhookHandler(BaseHTTPRequestHandler):
+        def _reply(self, code: int, body: Dict, close: bool = False):
+            """close: a refused request, whose body may be left unread; the connection is not reused"""
+            data = json.dumps(body).encode("utf-8")
+            self.send_response(code)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(data)))
+            if close:
+                self.send_header("Connection", "close")
+                self.close_connection = True
+            self.end_headers()
+            self.wfile.write(data)
+
+        def _authorized(self) -> bool:
+            token = self.server.token
+            if not token:
+                return True
+            sent = self.headers.get("X-Webhook-Token") or parse_qs(urlsplit(self.path).query).get("token", [""])[0]
+            return hmac.compare_digest(sent.encode("utf-8"), token.encode("utf-8"))
+
+        def do_GET(self):
+            if not self._authorized():
+                self._reply(403, {"error": "bad token"})
+                return
+            self._reply(200, {"root": str(self.server.root), "pending": len(self.server.pending)})
+
+        def do_POST(self):
+            if not self._authorized():
+                self._reply(403, {"error": "bad token"}, close=True)
+                return
+            try:
+                length = int(self.headers.get("Content-Length") or 0)
+            except ValueError:
+                length = -1
+            if length < 0:
+                self._reply(400, {"error": "bad Content-Length"}, close=True)
+                return
+            if length > WEBHOOK_MAX_BODY:
+                self._reply(413, {"error": "payload too large"}, close=True)
+                return
+            try:
+                payload = json.loads(self.rfile.read(length).decode("utf-8-sig") or "null")
+            except ValueError:
+                self._reply(400, {"error": "invalid JSON"}, close=True)
+                return
+            self._reply(202, self.server.submit(webhook_paths(payload)))
+
+        def log_message(self, format, *args):
+            pass  # the burn loop prints what happens to each folder
+
+    class WebhookServer(ThreadingHTTPServer):
+        daemon_threads = True
+
+        def __init__(self):
+            super().__init__(address, WebhookHandler)
+            self.root = root
+            self.pending = pending
+            self.path_map = list(path_map or [])
+            self.token = token
+
+        def submit(self, item_paths: List[str]) -> Dict[str, int]:
+            counts = {"paths": len(item_paths), "queued": 0, "already_queued": 0, "ignored": 0}
+            for item_path in item_paths:
+                dirs = webhook_dirs(item_path, self.root, self.path_map)
+                if not dirs:
+                    counts["ignored"] += 1
+                for d in dirs:
+                    counts["queued" if self.pending.put(d) else "already_queued"] += 1
+            return counts
+
+    return WebhookServer()
+
+
+def serve_webhook(root: Path, cfg: Dict, preferred_field: str, index: StateIndex,
+                  sources: Optional[List[RatingSource]] = None, path_map: Optional[List[Tuple[str, str]]] = None,
+                  host: str = WEBHOOK_HOST, port: int = WEBHOOK_PORT, token: Optional[str] = WEBHOOK_TOKEN,
+                  delay: float = WATCH_DEBOUNCE, stop: Optional[threading.Event] = None) -> Dict[str, int]:
+    """
+    Re-burn the folders of items POSTed by the Jellyfin Webhook plugin, until stop is set or Ctrl+C.
+    Folders wait `delay` seconds, so the files of one metadata refresh are all written first.
+    """
+    _RATING_SOURCES[:] = sources or []
+    _init_burn_worker(cfg, sources)
+    tally = BurnTally(cfg, preferred_field, index)
+    pending = DirQueue(delay)
+    server = make_webhook_server((host, port), root, pending, path_map, token)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    info(f"Listening for webhooks on http://{host}:{server.server_address[1]}/")
+    try:
+        while stop is None or not stop.is_set():
+            ready = pending.take_ready(timeout=1.0)
+            for d in ready:
+                _reburn(d, root, cfg, preferred_field, tally)
+            if ready:
+                index.commit()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.shutdown()
+        server.server_close()
+        index.commit()
+    return tally.counts
+
+
+# ============================================================
+# Reduced-scale decode check
+# ============================================================
+
+def check_draft_decoding(records: Iterable[DirRecord], sample: int = 50) -> Tuple[int, int]:
+    """Compare reduced-scale and full decoding on up to `sample` render bases; returns (checked, over limit)"""
+    checked = 0
+    over = 0
+    for rec in records:
+        if checked >= sample:
+            break
+        base = newest_clean_backup(rec) or rec.cover
+        if base is None:
+            continue
+        try:
+            mean, peak = draft_decode_drift(base)
+        except Exception as e:
+            err(f"[{rec.path}] Decode check error: {e}")
+            continue
+        checked += 1
+        if mean > DRAFT_MAX_MEAN_DIFF:
+            over += 1
+            warn(f"[{rec.path}] {base.name}: mean diff {mean:.2f}, max {peak}")
+        else:
+            info(f"[{rec.path}] {base.name}: mean diff {mean:.2f}, max {peak}")
+    return checked, over
 
 
 # ============================================================
 # Config from user
 # ============================================================
 
+@dataclass
+class BadgeStyle:
+    """Badge options as the user picks them (see build_cfg_from_user); cfg() gives the render config"""
+    star_hex: str = DEFAULT_HEX
+    text_hex: str = DEFAULT_HEX
+    opacity: int = DEFAULTS["bg_rgba"][3]  # background alpha 0-255
+    scale: float = 100.0                   # percent of the default badge size
+    offset_right: int = DEFAULTS["offset_right"]
+    offset_bottom: int = DEFAULTS["offset_bottom"]
+    round_left: bool = True
+    round_right: bool = True
+
+    def cfg(self) -> Dict:
+        scale = self.scale / 100.0
+        return {
+            "offset_right": self.offset_right,
+            "offset_bottom": self.offset_bottom,
+            "inner_pad_x": max(1, int(round(DEFAULTS["inner_pad_x"] * scale))),
+            "inner_pad_y": max(1, int(round(DEFAULTS["inner_pad_y"] * scale))),
+            "corner_radius": max(1, int(round(DEFAULTS["corner_radius"] * scale))),
+            "star_size": max(1, int(round(DEFAULTS["star_size"] * scale))),
+            "star_text_gap": max(1, int(round(DEFAULTS["star_text_gap"] * scale))),
+            "font_size": max(1, int(round(DEFAULTS["font_size"] * scale))),
+            "bg_rgba": (0, 0, 0, int(self.opacity)),
+            "star_color": (*parse_hex_to_rgb(self.star_hex), 255),
+            "text_color": (*parse_hex_to_rgb(self.text_hex), 255),
+            "round_left": self.round_left,
+            "round_right": self.round_right,
+        }
+
+
 def build_cfg_from_user() -> Dict:
     print("\n" + color_hex_text("═" * 60, "#FF8C00"))
     question("Tip: press Enter to accept default value in brackets [].")
@@ -728,7 +3488,6 @@ def build_cfg_from_user() -> Dict:
     )
 
     scale_percent = parse_float("Rating size scale:", 100.0, min_v=10.0, max_v=400.0)
-    scale = scale_percent / 100.0
 
     offset_right = parse_int("Pixels from right edge?", DEFAULTS["offset_right"], min_v=0, max_v=10000)
     offset_bottom = parse_int("Pixels from bottom edge?", DEFAULTS["offset_bottom"], min_v=0, max_v=10000)
@@ -739,22 +3498,245 @@ def build_cfg_from_user() -> Dict:
     ans_right = input("Round right sides of background? [Y/n]: ").strip().lower()
     round_right = ans_right not in ("n", "no")
 
-    cfg = {
-        "offset_right": offset_right,
-        "offset_bottom": offset_bottom,
-        "inner_pad_x": max(1, int(round(DEFAULTS["inner_pad_x"] * scale))),
-        "inner_pad_y": max(1, int(round(DEFAULTS["inner_pad_y"] * scale))),
-        "corner_radius": max(1, int(round(DEFAULTS["corner_radius"] * scale))),
-        "star_size": max(1, int(round(DEFAULTS["star_size"] * scale))),
-        "star_text_gap": max(1, int(round(DEFAULTS["star_text_gap"] * scale))),
-        "font_size": max(1, int(round(DEFAULTS["font_size"] * scale))),
-        "bg_rgba": (0, 0, 0, int(opacity_alpha)),
-        "star_color": (*parse_hex_to_rgb(star_hex), 255),
-        "text_color": (*parse_hex_to_rgb(text_hex), 255),
-        "round_left": round_left,
-        "round_right": round_right,
-    }
-    return cfg
+    style = BadgeStyle(star_hex, text_hex, opacity_alpha, scale_percent, offset_right, offset_bottom,
+                       round_left, round_right)
+    return style.cfg()
+
+
+# ============================================================
+# Headless API (scripts, cron, command line)
+# ============================================================
+
+class BurnEngine:
+    """
+    Burn / restore without prompts. The badge atlas, rating sources, state index and worker pool
+    are set up once and stay warm for every call:
+
+        with BurnEngine(BadgeStyle(scale=120), "rating", workers=4) as engine:
+            for res in engine.burn(["/media/movies"]):
+                print(res.path, res.status)
+    """
+
+    def __init__(self, style: Optional[BadgeStyle] = None, preferred_field: str = "rating",
+                 sources: Optional[List[RatingSource]] = None, workers: int = 1, engine: str = "processes",
+                 recursive: bool = True, state_index: Union[bool, Path, StateIndex] = False):
+        if preferred_field not in ("rating", "criticrating"):
+            raise ValueError(f"Unknown rating field: {preferred_field}")
+        if engine not in ("processes", "pipeline"):
+            raise ValueError(f"Unknown engine: {engine}")
+        self.style = style or BadgeStyle()
+        self.cfg = self.style.cfg()
+        self.preferred_field = preferred_field
+        self.sources = list(sources or [])
+        self.workers = max(1, workers)
+        if engine == "processes" and self.workers > 1 and not worker_processes_supported():
+            warnings.warn(f"worker processes cannot import {__name__!r}, using the pipeline engine instead "
+                          "(import the script by its file name with its folder on sys.path)", RuntimeWarning,
+                          stacklevel=2)
+            engine = "pipeline"
+        self.engine = engine
+        self.recursive = recursive
+        if isinstance(state_index, StateIndex):
+            self.index: Optional[StateIndex] = state_index
+        elif state_index is True:
+            self.index = StateIndex()
+        elif state_index:
+            self.index = StateIndex(Path(state_index))
+        else:
+            self.index = None
+        self._pool: Optional[futures.ProcessPoolExecutor] = None
+        _RATING_SOURCES[:] = self.sources
+        _init_burn_worker(self.cfg, self.sources)
+
+    def __enter__(self) -> "BurnEngine":
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def _records(self, paths: Iterable[Union[str, Path]]) -> Iterable[DirRecord]:
+        for p in paths:
+            yield from iter_dir_records(Path(p), self.recursive)
+
+    def _worker_pool(self) -> Optional[futures.ProcessPoolExecutor]:
+        if self.engine == "processes" and self.workers > 1 and self._pool is None:
+            self._pool = futures.ProcessPoolExecutor(max_workers=self.workers, initializer=_init_burn_worker,
+                                                     initargs=(self.cfg, self.sources))
+        return self._pool
+
+    def _state_index(self) -> StateIndex:
+        if self.index is None:
+            self.index = StateIndex()
+        return self.index
+
+    def burn(self, paths: Iterable[Union[str, Path]], echo: bool = False) -> List[DirResult]:
+        """One DirResult per folder under paths (its console output is in .lines)"""
+        results: List[DirResult] = []
+        run_burn(self._records(paths), self.cfg, self.preferred_field, workers=self.workers, index=self.index,
+                 engine=self.engine, sources=self.sources, results=results, echo=echo, pool=self._worker_pool())
+        return results
+
+    def restore(self, paths: Iterable[Union[str, Path]], echo: bool = False) -> List[DirResult]:
+        results = []
+        for rec in self._records(paths):
+            with captured_output() as lines:
+                if rec.cover is None:
+                    status = "no_cover"
+                else:
+                    try:
+                        status = "restored" if restore_cover(rec) else "no_backup"
+                    except Exception as e:
+                        err(f"[{rec.path}] Restore error: {e}")
+                        status = "error"
+            if echo:
+                for line in lines:
+                    print(line)
+            results.append(DirResult(rec.path, status, lines))
+        return results
+
+    def watch(self, root: Union[str, Path], stop: Optional[threading.Event] = None) -> Dict[str, int]:
+        return watch_library(Path(root), self.cfg, self.preferred_field, self._state_index(), self.recursive,
+                             self.sources, stop=stop)
+
+    def serve_webhook(self, root: Union[str, Path], path_map: Optional[List[Tuple[str, str]]] = None,
+                      host: str = WEBHOOK_HOST, port: int = WEBHOOK_PORT, token: Optional[str] = WEBHOOK_TOKEN,
+                      stop: Optional[threading.Event] = None) -> Dict[str, int]:
+        return serve_webhook(Path(root), self.cfg, self.preferred_field, self._state_index(), self.sources,
+                             path_map, host, port, token, stop=stop)
+
+    def close(self):
+        if self._pool is not None:
+            self._pool.shutdown()
+            self._pool = None
+        if self.index is not None:
+            self.index.close()
+            self.index = None
+
+
+# ============================================================
+# Command line (non-interactive)
+# ============================================================
+
+def _parse_path_map(items: Iterable[str]) -> List[Tuple[str, str]]:
+    path_map = []
+    for item in items:
+        src, sep, dst = item.partition("=")
+        if not sep or not src or not dst:
+            raise ValueError(f"Path mapping must be JELLYFIN_PATH=LOCAL_PATH: {item}")
+        path_map.append((src, dst))
+    return path_map
+
+
+def engine_from_options(opts: Dict) -> BurnEngine:
+    """BurnEngine from config-file style options ({"style": {...}, "field": ..., "workers": ...})"""
+    path_map = opts.get("path_map") or []
+    if isinstance(path_map, dict):
+        path_map = list(path_map.items())
+    sources: List[RatingSource] = []
+    if opts.get("jellyfin_db"):
+        sources.append(JellyfinRatings(Path(opts["jellyfin_db"]), path_map))
+    if opts.get("imdb_ratings"):
+        sources.append(ImdbRatings(Path(opts["imdb_ratings"])))
+    return BurnEngine(
+        BadgeStyle(**opts.get("style", {})),
+        preferred_field=opts.get("field", "rating"),
+        sources=sources,
+        workers=int(opts.get("workers", 1)),
+        engine=opts.get("engine", "processes"),
+        recursive=bool(opts.get("recursive", True)),
+        state_index=opts.get("state_index", False),
+    )
+
+
+def cli(argv: List[str]) -> int:
+    import argparse
+
+    enable_console_colors()
+    ap = argparse.ArgumentParser(
+        prog=Path(sys.argv[0]).name,
+        description="Burn rating badges into folder.jpg covers without prompts. "
+                    "Run without arguments for the interactive menu.",
+    )
+    sub = ap.add_subparsers(dest="command", required=True)
+    p = sub.add_parser("setup", help="install missing required packages (pip)")
+    p.add_argument("--yes", action="store_true", help="do not ask before installing")
+
+    common = argparse.ArgumentParser(add_help=False)
+    common.add_argument("--config", type=Path, help="JSON file with options (command line options win)")
+    common.add_argument("--no-recursive", dest="recursive", action="store_const", const=False,
+                        help="only the given folders, not their subfolders")
+    rating = argparse.ArgumentParser(add_help=False)
+    rating.add_argument("--field", choices=("rating", "criticrating"))
+    rating.add_argument("--jellyfin-db", help="read ratings from library.db / jellyfin.db (NFOs as fallback)")
+    rating.add_argument("--imdb-ratings", help="read ratings from an IMDb title.ratings.tsv.gz (NFOs as fallback)")
+    rating.add_argument("--path-map", action="append", metavar="JELLYFIN=LOCAL",
+                        help="library path prefix as Jellyfin sees it = same folder here (repeatable)")
+    rating.add_argument("--state-index", action="store_const", const=True,
+                        help="skip folders unchanged since the last run")
+
+    p = sub.add_parser("burn", parents=[common, rating], help="place/refresh rating badges")
+    p.add_argument("paths", nargs="+")
+    p.add_argument("--workers", type=int)
+    p.add_argument("--engine", choices=("processes", "pipeline"))
+    p.add_argument("--json", action="store_true", help="print per-folder results as JSON")
+    p = sub.add_parser("restore", parents=[common], help="restore covers from the latest clean backup")
+    p.add_argument("paths", nargs="+")
+    p.add_argument("--json", action="store_true", help="print per-folder results as JSON")
+    p = sub.add_parser("watch", parents=[common, rating], help="re-burn folders as their files change")
+    p.add_argument("root")
+    p = sub.add_parser("webhook", parents=[common, rating], help="re-burn items reported by Jellyfin webhooks")
+    p.add_argument("root")
+    p.add_argument("--host")
+    p.add_argument("--port", type=int)
+    p.add_argument("--token")
+    args = ap.parse_args(argv)
+
+    if args.command == "setup":
+        ensure_deps(assume_yes=args.yes)
+        ok("All required packages are installed.")
+        return 0
+    missing = missing_deps()
+    if missing:
+        err(f"Missing packages: {', '.join(pip for _, pip in missing)}. Run: {ap.prog} setup")
+        return 2
+
+    opts: Dict = {}
+    try:
+        if args.config is not None:
+            opts = json.loads(args.config.read_text(encoding="utf-8"))
+        for name in ("recursive", "field", "jellyfin_db", "imdb_ratings", "state_index", "workers", "engine",
+                     "host", "port", "token"):
+            if getattr(args, name, None) is not None:
+                opts[name] = getattr(args, name)
+        if getattr(args, "path_map", None):
+            opts["path_map"] = _parse_path_map(args.path_map)
+        elif isinstance(opts.get("path_map"), dict):
+            opts["path_map"] = list(opts["path_map"].items())
+        engine = engine_from_options(opts)
+    except (OSError, ValueError, TypeError, sqlite3.Error) as e:
+        err(f"Invalid options: {e}")
+        return 2
+
+    with engine:
+        if args.command in ("burn", "restore"):
+            run = engine.burn if args.command == "burn" else engine.restore
+            results = run(args.paths, echo=not args.json)
+            counts: Dict[str, int] = {}
+            for res in results:
+                counts[res.status] = counts.get(res.status, 0) + 1
+            if args.json:
+                print(json.dumps({"counts": counts, "results": [res.to_dict() for res in results]}, indent=2))
+            else:
+                ok(", ".join(f"{k}: {v}" for k, v in sorted(counts.items())) or "No folders.")
+            return 1 if counts.get("error") else 0
+
+        if args.command == "watch":
+            counts = engine.watch(args.root)
+        else:
+            counts = engine.serve_webhook(args.root, opts.get("path_map"), opts.get("host", WEBHOOK_HOST),
+                                          int(opts.get("port", WEBHOOK_PORT)), opts.get("token", WEBHOOK_TOKEN))
+        ok(f"Stopped. Re-burned {counts['processed']} directories.")
+        return 1 if counts["error"] else 0
 
 
 # ============================================================
@@ -792,7 +3774,10 @@ def ask_root_path_required(default_path: Optional[Path] = None) -> Path:
 
 
 def main():
-    print(Style.BRIGHT + "Burn rating into cover art." + Style.RESET_ALL)
+    # Interactive runs offer to install missing packages; the command line has "setup" for that
+    ensure_deps()
+    enable_console_colors()
+    print("\x1b[1m" + "Burn rating into cover art." + ansi_reset())
     last_root = None
 
     while True:
@@ -800,10 +3785,14 @@ def main():
         question("What do you want to do?")
         print("  1) Place/refresh rating on covers (folder.jpg)")
         print("  2) Restore covers from latest clean backup – no rating")
+        print("  3) Check reduced-scale decoding against full decoding (sample of covers)")
+        print("  4) Prune old backups (keep newest N, drop duplicates)")
+        print("  5) Watch the library and re-burn covers as Jellyfin changes them")
+        print("  6) Listen for Jellyfin webhooks and re-burn the reported items")
         print(color_hex_text("═" * 60, "#FF8C00"))
-        choice = input(color_hex_text("Choice [1/2]: ", "#FF8C00")).strip()
+        choice = input(color_hex_text("Choice [1/2/3/4/5/6]: ", "#FF8C00")).strip()
 
-        if choice not in ("1", "2"):
+        if choice not in ("1", "2", "3", "4", "5", "6"):
             err("Invalid choice.")
             continue
 
@@ -815,18 +3804,113 @@ def main():
 
         info(f"Starting directory: {root}")
 
+        if choice == "3":
+            checked, over = check_draft_decoding(iter_dir_records(root, recursive))
+            if over:
+                warn(f"{over} of {checked} covers differ by more than {DRAFT_MAX_MEAN_DIFF} on average.")
+                warn("Set DRAFT_DECODE = False (or raise DRAFT_OVERSAMPLE) at the top of the script.")
+            else:
+                ok(f"Done. {checked} covers checked, reduced-scale decoding is visually equivalent.")
+            try:
+                input("\nPress Enter to return to menu or close script window...")
+            except Exception:
+                pass
+            continue
+
+        if choice == "4":
+            policy, dry_run = ask_prune_policy()
+            counts = run_prune(iter_dir_records(root, recursive), policy, root, recursive, dry_run=dry_run)
+            print()
+            summary = (f"{counts['backups']} backups in {counts['pruned']} directories (checked {counts['checked']}), "
+                       f"{counts['files']} files / {format_size(counts['bytes'])}")
+            if dry_run:
+                ok(f"Dry run: would remove {summary}.")
+            else:
+                ok(f"Done. Removed {summary}.")
+            if counts["error"]:
+                err(f"Errors: {counts['error']}.")
+            try:
+                input("\nPress Enter to return to menu or close script window...")
+            except Exception:
+                pass
+            continue
+
+        if choice == "5":
+            preferred_field = ask_rating_field_global()
+            source = ask_rating_source()
+            sources = [source] if source is not None else []
+            cfg = build_cfg_from_user()
+            ans_full = input(color_hex_text("Burn all folders once before watching? [y/N]: ", "#FF8C00")).strip().lower()
+            index = StateIndex()
+            try:
+                if ans_full in ("y", "yes"):
+                    counts = run_burn(iter_dir_records(root, recursive), cfg, preferred_field,
+                                      workers=ask_workers("processes"), index=index, sources=sources)
+                    ok(f"Processed {counts['processed']} directories (checked {counts['checked']}).")
+                info("Press Ctrl+C to stop watching.")
+                counts = watch_library(root, cfg, preferred_field, index, recursive, sources)
+            finally:
+                index.close()
+            print()
+            ok(f"Stopped watching. Re-burned {counts['processed']} directories.")
+            if counts["error"]:
+                err(f"Errors: {counts['error']}.")
+            try:
+                input("\nPress Enter to return to menu or close script window...")
+            except Exception:
+                pass
+            continue
+
+        if choice == "6":
+            preferred_field = ask_rating_field_global()
+            source = ask_rating_source()
+            sources = [source] if source is not None else []
+            cfg = build_cfg_from_user()
+            info("Item paths in webhook payloads are as Jellyfin sees them.")
+            path_map = ask_path_map()
+            port = parse_int("Port to listen on", WEBHOOK_PORT, min_v=1, max_v=65535)
+            index = StateIndex()
+            try:
+                info("Press Ctrl+C to stop listening.")
+                counts = serve_webhook(root, cfg, preferred_field, index, sources, path_map, port=port)
+            finally:
+                index.close()
+            print()
+            ok(f"Stopped listening. Re-burned {counts['processed']} directories.")
+            if counts["error"]:
+                err(f"Errors: {counts['error']}.")
+            try:
+                input("\nPress Enter to return to menu or close script window...")
+            except Exception:
+                pass
+            continue
+
         if choice == "2":
+            timing, use_cprofile, trace_memory, export = ask_instrumentation()
+            stats = RunStats() if timing else None
             restored = 0
             checked = 0
-            for d in iter_target_dirs(root, recursive):
-                checked += 1
-                try:
-                    if restore_cover(d):
-                        restored += 1
-                except Exception as e:
-                    err(f"[{d}] Restore error: {e}")
+            with profiled(use_cprofile, trace_memory, export):
+                for rec in iter_dir_records(root, recursive):
+                    checked += 1
+                    t = time.perf_counter()
+                    with timed_stages(enabled=timing) as timings:
+                        try:
+                            if restore_cover(rec):
+                                restored += 1
+                        except Exception as e:
+                            err(f"[{rec.path}] Restore error: {e}")
+                    if timings:
+                        timings["total"] = time.perf_counter() - t
+                        stats.add(rec.path, timings)
             
             ok(f"Done. Restored {restored} directories (checked {checked}).")
+            if stats is not None:
+                stats.finish()
+                stats.print_summary()
+                if export is not None:
+                    stats.export(export)
+                    ok(f"Timings saved to {export}")
             try:
                 input("\nPress Enter to return to menu or close script window...")
             except Exception:
@@ -835,32 +3919,58 @@ def main():
 
         if choice == "1":
             preferred_field = ask_rating_field_global()
+            source = ask_rating_source()
+            sources = [source] if source is not None else []
             cfg = build_cfg_from_user()
+            engine = ask_engine()
+            workers = ask_workers(engine)
+            index = StateIndex() if ask_use_state_index() else None
+            progress_mode, precount = ask_progress_mode()
+            timing, use_cprofile, trace_memory, export = ask_instrumentation()
+            stats = RunStats() if timing else None
+            progress = log = None
+            if progress_mode:
+                total = None
+                if precount:
+                    info("Counting folders...")
+                    total = count_dirs(root, recursive)
+                progress = ProgressLine(total)
+                log = RunLog(default_log_path("burn"))
+            if (use_cprofile or trace_memory) and engine == "processes" and workers > 1:
+                warn("cProfile/tracemalloc only see this process: use 1 worker or the threaded pipeline.")
 
-            processed = 0
-            checked = 0
-            skipped_no_cover = 0
-            skipped_no_nfo = 0
-
-            for d in iter_target_dirs(root, recursive):
-                checked += 1
-                cover = d / COVER_NAME
-                if not cover.exists():
-                    skipped_no_cover += 1
-                    continue
-
-                try:
-                    did = process_dir(d, cfg, preferred_field=preferred_field)
-                    if did:
-                        processed += 1
-                    else:
-                        skipped_no_nfo += 1
-                except Exception as e:
-                    err(f"[{d}] Error: {e}")
+            try:
+                with profiled(use_cprofile, trace_memory, export):
+                    try:
+                        counts = run_burn(iter_dir_records(root, recursive), cfg, preferred_field,
+                                          workers=workers, index=index, engine=engine, stats=stats,
+                                          progress=progress, log=log, sources=sources)
+                    finally:
+                        # End the progress line before the profile report is printed below it
+                        if progress is not None:
+                            progress.finish()
+            finally:
+                if index is not None:
+                    index.close()
+                if log is not None:
+                    log.close()
 
             print()
-            ok(f"Result: processed {processed} directories.")
-            info(f"Checked: {checked}. No folder.jpg: {skipped_no_cover}. No NFO with rating: {skipped_no_nfo}.")
+            ok(f"Result: processed {counts['processed']} directories.")
+            info(f"Checked: {counts['checked']}. No folder.jpg: {counts['no_cover']}. No NFO with rating: {counts['skipped']}.")
+            if counts["current"]:
+                info(f"Already showing this rating and style (not re-rendered): {counts['current']}.")
+            if counts["unchanged"]:
+                info(f"Unchanged since last run (skipped): {counts['unchanged']}.")
+            if counts["error"]:
+                err(f"Errors: {counts['error']}.")
+            if log is not None:
+                info(f"Per-folder details: {log.path}")
+            if stats is not None:
+                stats.print_summary()
+                if export is not None:
+                    stats.export(export)
+                    ok(f"Timings saved to {export}")
             
             # Required testing message and restart option
             print("\n" + color_hex_text("═" * 60, "#33DD66"))
@@ -876,4 +3986,6 @@ def main():
 
 
 if __name__ == "__main__":
+    if len(sys.argv) > 1:
+        sys.exit(cli(sys.argv[1:]))
     main()